@@ -5,21 +5,39 @@ import warnings
 warnings.filterwarnings('ignore')
 
 from utils.config import DEBUG, PORT, HOST
+from utils.logging_setup import configure_logging
+
+configure_logging()
+
 from components.layout import create_layout
 from components.callbacks import register_callbacks
+from utils.tile_proxy import register_tile_proxy
+from utils.compositing import register_compositing
+from utils.field_overlay import register_field_overlay
+from utils.background import background_manager
+from utils.metrics import register_metrics
 
 # Initialize the app
 app = dash.Dash(
     __name__, 
     external_stylesheets=[dbc.themes.DARKLY],
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    background_callback_manager=background_manager
 )
 
-# Configure layout
-app.layout = create_layout()
+# Configure layout (served per page load for per-session state)
+app.layout = create_layout
 
 # Register callbacks
 register_callbacks(app)
 
+# Serve map tiles through the local caching proxy
+register_tile_proxy(app.server)
+register_compositing(app.server)
+register_field_overlay(app.server)
+
+# Callback timing and the /metrics endpoint (no-op unless METRICS_ENABLED)
+register_metrics(app.server)
+
 if __name__ == "__main__":
     app.run(debug=DEBUG, port=PORT, host=HOST)
\ No newline at end of file
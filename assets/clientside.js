@@ -0,0 +1,125 @@
+// assets/clientside.js
+// UI-only callbacks that run in the browser instead of costing a server round trip.
+// Gauge figure of one frame: the template with that frame's values set in its first trace
+function gaugeFigure(gauge, frame) {
+    var values = gauge.frames[frame];
+    if (!values) {
+        return gauge.empty;
+    }
+    var data = JSON.parse(JSON.stringify(gauge.template.data));
+    values.forEach(function(pair) {
+        var path = pair[0];
+        var target = data[0];
+        for (var i = 0; i < path.length - 1; i++) {
+            target = target[path[i]];
+        }
+        target[path[path.length - 1]] = pair[1];
+    });
+    return {data: data, layout: gauge.template.layout};
+}
+
+// dash-leaflet children for layer specs, as built by components/map_layers.py
+function layerComponents(specs) {
+    return specs.map(function(spec) {
+        var props = Object.assign({}, spec);
+        var type = props.type === 'image' ? 'ImageOverlay' : 'TileLayer';
+        delete props.type;
+        return {type: type, namespace: 'dash_leaflet', props: props};
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        toggleChart: function(n_clicks, visibility_data) {
+            var chart_visible = n_clicks ? !visibility_data.chart_visible : true;
+            var style = {
+                position: 'absolute',
+                top: '240px',
+                left: chart_visible ? '20px' : '-850px',
+                zIndex: 1000,
+                transition: 'all 0.3s ease-in-out'
+            };
+            var label = chart_visible ? '📈 Hide Chart' : '📈 Show Chart';
+            return [style, label, {chart_visible: chart_visible}];
+        },
+
+        controlAnimation: function(play_clicks, pause_clicks, data, year) {
+            var no_update = window.dash_clientside.no_update;
+            var triggered = window.dash_clientside.callback_context.triggered;
+            if (!triggered.length || triggered[0].prop_id === '.') {
+                return [data, '⏹️ Stopped', true, no_update];
+            }
+
+            var trigger_id = triggered[0].prop_id.split('.')[0];
+            if (trigger_id === 'play-animation') {
+                // Playback starts from the year on the slider
+                data = Object.assign({}, data, {is_playing: true, current_year: year});
+                return [data, '▶️ Playing... Year: ' + data.current_year, false, no_update];
+            }
+            if (trigger_id === 'pause-animation') {
+                // Frames played from the bundle leave the slider behind: catch it up once
+                data = Object.assign({}, data, {is_playing: false});
+                var slider = data.current_year !== year ? data.current_year : no_update;
+                return [data, '⏸️ Paused - Year: ' + data.current_year, true, slider];
+            }
+            return [data, '⏹️ Stopped', true, no_update];
+        },
+
+        updateAnimationFrame: function(n_intervals, data, bundle, region, instruments, mode, field, chart_mode) {
+            var no_update = window.dash_clientside.no_update;
+            var unchanged = [no_update, no_update, no_update, no_update, no_update, no_update,
+                             no_update, no_update, no_update, no_update, no_update, no_update];
+            if (!data.is_playing) {
+                return unchanged;
+            }
+
+            var key = JSON.stringify([region, instruments, mode, field, chart_mode]);
+            if (!bundle || JSON.stringify(bundle.key) !== key) {
+                // No matching bundle (yet): the server renders this frame
+                var next_year = data.current_year + 1;
+                if (next_year > data.last_year || next_year < data.first_year) {
+                    next_year = data.first_year;
+                }
+                data = Object.assign({}, data, {current_year: next_year, bundle_id: null});
+                return [next_year, data, '▶️ Playing... Year: ' + next_year].concat(unchanged.slice(3));
+            }
+
+            // Loop over the years of the bundle
+            var frame = (bundle.years.indexOf(data.current_year) + 1) % bundle.years.length;
+            var current_year = bundle.years[frame];
+            data = Object.assign({}, data, {current_year: current_year});
+            var status = '▶️ Playing... Year: ' + current_year;
+
+            var gauges = bundle.gauges;
+            var kinds = ['temperature', 'precipitation', 'co'].map(function(name) {
+                var gauge = gauges[name];
+                return gauge && gauge.frames[frame] ? gauge.kind : null;
+            });
+
+            // The comparison chart holds every year: draw it once per bundle
+            var comparison = no_update;
+            var comparison_state = no_update;
+            if (bundle.comparison && data.bundle_id !== bundle.id) {
+                comparison = bundle.comparison;
+                comparison_state = bundle.comparison_state;
+            }
+            data.bundle_id = bundle.id;
+
+            var specs = bundle.layers[frame];
+            return [
+                no_update,
+                data,
+                status,
+                gaugeFigure(gauges.temperature, frame),
+                gaugeFigure(gauges.precipitation, frame),
+                gauges.co ? gaugeFigure(gauges.co, frame) : no_update,
+                comparison,
+                gauges.co ? kinds : [kinds[0], kinds[1], null],
+                comparison_state,
+                bundle.freshness[frame],
+                layerComponents(specs),
+                specs
+            ];
+        }
+    }
+});
@@ -0,0 +1,478 @@
+# benchmarks/callbacks.py
+"""Callback latency benchmark against local stand-ins for the Meteomatics API and GIBS
+
+Drives the registered server callbacks through /_dash-update-component with
+the Flask test client, exactly as the browser would, polling background
+jobs like the renderer does. meteomatics.api.query_time_series is replaced
+by a deterministic fake with a configurable latency, and so are the MOPITT
+tiles and colormap the default CO source samples. No credentials or network
+access are needed:
+
+    python benchmarks/callbacks.py
+    python benchmarks/callbacks.py --latency-ms 400 --sessions 16 --loops 2
+    python benchmarks/callbacks.py --config all --scenario animation --json
+
+Scenarios:
+  cold       every region and year once, starting from empty caches
+  warm       the same requests again with the caches filled
+  animation  N concurrent sessions playing 2016-2024 (from empty caches)
+
+Configurations (each runs in its own interpreter, since settings are read
+at import time):
+  default         the app's own defaults: inline callbacks, CO from MOPITT tiles
+  background      BACKGROUND_CALLBACKS=True: DiskCache jobs plus result polling
+  meteomatics-co  CO_SOURCE=meteomatics: CO requested from the API
+
+The animation frame itself advances in the browser (updateAnimationFrame in
+assets/clientside.js); here each frame is the year change it produces,
+which triggers update_view_mode and update_weather_graphs.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Callbacks are keyed by an output they own
+VIEW_CALLBACK = 'map.children'
+WEATHER_CALLBACK = 'temperature-graph.figure'
+
+# Environment overrides of each benchmarked configuration
+CONFIGS = {
+    'default': {},
+    'background': {'BACKGROUND_CALLBACKS': 'True'},
+    'meteomatics-co': {'CO_SOURCE': 'meteomatics'}
+}
+
+# Give up on a background job that never produces a result
+JOB_TIMEOUT_SECONDS = 120
+
+# Store outputs the browser would feed back as State on the next call
+STORE_OUTPUTS = {
+    ('map-layers-store', 'data'),
+    ('gauge-kinds-store', 'data'),
+    ('comparison-state-store', 'data')
+}
+
+
+class FakeMeteomatics:
+    """Deterministic stand-in for meteomatics.api with a configurable latency
+
+    Values are smooth functions of position and time, so repeated runs see
+    the same data. Only query_time_series is provided. Calls are counted in
+    shared memory so queries made by forked background jobs are included.
+    """
+
+    def __init__(self, latency_ms=150, jitter_ms=0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._calls = multiprocessing.Value('l', 0)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self):
+        return self._calls.value
+
+    def _value(self, parameter, lat, lon, hours):
+        phase = 2 * np.pi * hours / 24
+        if parameter.startswith('t_2m'):
+            return 30 - abs(lat) / 2 + 6 * np.sin(phase + lon / 30)
+        if parameter.startswith('precip_1h'):
+            return np.clip(np.sin(phase / 7 + lat) - 0.6, 0, None) * 2
+        if parameter.startswith('wind_speed_10m'):
+            return 3 + 2 * np.cos(phase / 3 + lon / 45) ** 2
+        if parameter.startswith('co'):
+            return 250 + 150 * np.sin(phase / 5 + lat / 10) ** 2
+        return np.zeros_like(hours)
+
+    def query_time_series(self, coordinate_list, startdate, enddate, interval, parameters,
+                          username=None, password=None, model=None, **kwargs):
+        import pandas as pd
+
+        with self._calls.get_lock():
+            self._calls.value += 1
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(delay, 0) / 1000)
+
+        times = pd.date_range(startdate, enddate, freq=interval, tz='UTC')
+        hours = (times.asi8 // 3_600_000_000_000).astype(np.float64)
+        frames = []
+        for lat, lon in coordinate_list:
+            data = {parameter: self._value(parameter, lat, lon, hours) for parameter in parameters}
+            index = pd.MultiIndex.from_arrays(
+                [[lat] * len(times), [lon] * len(times), times], names=['lat', 'lon', 'validdate'])
+            frames.append(pd.DataFrame(data, index=index))
+        df = pd.concat(frames)
+
+        if len(coordinate_list) == 1:
+            # Single coordinate responses are indexed by validdate only
+            df = df.droplevel(['lat', 'lon'])
+        return df
+
+
+class FakeGibs:
+    """Stand-in for the GIBS tile server and the MOPITT colormap
+
+    Each tile is a single colour of the colormap picked from its key, so CO
+    sampling decodes real PNGs and maps real colours. Tiles take latency_ms
+    to arrive and are counted like upstream queries.
+    """
+
+    COLOURS = 32
+
+    def __init__(self, latency_ms=50):
+        self.latency_ms = latency_ms
+        self._calls = multiprocessing.Value('l', 0)
+
+    @property
+    def calls(self):
+        return self._calls.value
+
+    def _rgb(self, index):
+        return (40 + index * 6, 200 - index * 5, 90 + index * 3)
+
+    def colormap_xml(self):
+        entries = ''.join(
+            f'<ColorMapEntry rgb="{",".join(map(str, self._rgb(index)))}" '
+            f'value="[{(index + 1) * 1e17:.2e},{(index + 2) * 1e17:.2e})"/>'
+            for index in range(self.COLOURS))
+        return f'<ColorMaps><ColorMap>{entries}</ColorMap></ColorMaps>'.encode()
+
+    def refresh_tile(self, key, url, body, meta):
+        from PIL import Image
+        from utils.tile_proxy import tile_cache
+
+        with self._calls.get_lock():
+            self._calls.value += 1
+        time.sleep(self.latency_ms / 1000)
+
+        index = sum(key.encode()) % self.COLOURS
+        output = io.BytesIO()
+        Image.new('RGBA', (256, 256), self._rgb(index) + (255,)).save(output, format='PNG')
+        tile_cache.put(key, output.getvalue(), 'image/png')
+        return output.getvalue(), 'image/png'
+
+
+class CallbackClient:
+    """Call server callbacks through /_dash-update-component like the renderer"""
+
+    def __init__(self, app, poll_interval=0.2):
+        self.app = app
+        self.poll_interval = poll_interval
+        client = app.server.test_client()
+        dependencies = client.get('/_dash-dependencies').get_json()
+        self.dependencies = [dep for dep in dependencies if not dep.get('clientside_function')]
+
+    def find(self, output):
+        for dep in self.dependencies:
+            if output in dep['output']:
+                return dep
+        raise KeyError(f"No server callback outputs {output}")
+
+    @staticmethod
+    def _outputs(dep):
+        output = dep['output']
+        if output.startswith('..'):
+            parts = output[2:-2].split('...')
+        else:
+            parts = [output]
+        specs = []
+        for part in parts:
+            component_id, prop = part.rsplit('.', 1)
+            specs.append({'id': component_id, 'property': prop.split('@')[0]})
+        return specs if output.startswith('..') else specs[0]
+
+    def payload(self, dep, values, changed):
+        def spec(items):
+            return [{'id': item['id'], 'property': item['property'],
+                     'value': values.get((item['id'], item['property']))} for item in items]
+
+        return {
+            'output': dep['output'],
+            'outputs': self._outputs(dep),
+            'inputs': spec(dep['inputs']),
+            'state': spec(dep['state']),
+            'changedPropIds': [f"{component_id}.{prop}" for component_id, prop in changed]
+        }
+
+    def call(self, client, dep, values, changed):
+        """POST one callback; returns (seconds, payload bytes, {(id, prop): value})
+
+        A background callback answers with a job; it is polled every
+        poll_interval like the renderer does, and the time and bytes of all
+        polls are included.
+        """
+        body = self.payload(dep, values, changed)
+        started = time.perf_counter()
+        response = client.post('/_dash-update-component', json=body)
+        size = len(response.data)
+
+        data = response.get_json(silent=True) if response.status_code == 200 else None
+        job = data if data and 'cacheKey' in data else None
+        while job is not None and 'response' not in data:
+            if time.perf_counter() - started > JOB_TIMEOUT_SECONDS:
+                raise RuntimeError(f"Background job of {dep['output']} did not finish")
+            time.sleep(self.poll_interval)
+            response = client.post(
+                f"/_dash-update-component?cacheKey={job['cacheKey']}&job={job['job']}", json=body)
+            size += len(response.data)
+            if response.status_code != 200:
+                break
+            data = response.get_json(silent=True) or {}
+        elapsed = time.perf_counter() - started
+
+        if response.status_code == 204:
+            return elapsed, size, {}
+        if response.status_code != 200:
+            raise RuntimeError(f"Callback {dep['output']} failed with {response.status_code}")
+
+        outputs = {}
+        for component_id, props in (data or {}).get('response', {}).items():
+            for prop, value in props.items():
+                outputs[(component_id, prop)] = value
+        return elapsed, size, outputs
+
+
+class Session:
+    """One browser tab: its component values and the callbacks it triggers"""
+
+    def __init__(self, callbacks, region, chart_mode, instruments):
+        self.callbacks = callbacks
+        self.client = callbacks.app.server.test_client()
+        self.values = {
+            ('region-search', 'value'): region,
+            ('year', 'value'): 2024,
+            ('instrument-combination', 'value'): list(instruments),
+            ('chart-mode', 'value'): chart_mode,
+            ('view-mode', 'value'): 'with-borders',
+            ('session-id', 'data'): str(uuid.uuid4()),
+            ('map-layers-store', 'data'): None,
+            ('gauge-kinds-store', 'data'): [None, None, None],
+            ('comparison-state-store', 'data'): None
+        }
+
+    def trigger(self, name, changed, recorder):
+        dep = self.callbacks.find(name)
+        elapsed, size, outputs = self.callbacks.call(self.client, dep, self.values, changed)
+        for key, value in outputs.items():
+            if key in STORE_OUTPUTS:
+                self.values[key] = value
+        recorder.record(name, elapsed, size)
+
+    def show(self, region, year, recorder):
+        """Switch to a region and year, firing what the browser would fire"""
+        changed = []
+        if self.values[('region-search', 'value')] != region:
+            self.values[('region-search', 'value')] = region
+            changed.append(('region-search', 'value'))
+        self.values[('year', 'value')] = year
+        changed.append(('year', 'value'))
+
+        self.trigger(VIEW_CALLBACK, [('year', 'value')], recorder)
+        self.trigger(WEATHER_CALLBACK, changed, recorder)
+
+
+class Recorder:
+    """Thread-safe collection of per-callback latencies and payload sizes"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, size):
+        with self._lock:
+            self.samples.setdefault(name, []).append((seconds, size))
+
+    def summary(self, wall_seconds):
+        report = {}
+        for name, samples in self.samples.items():
+            latencies = np.array([seconds for seconds, _ in samples]) * 1000
+            sizes = np.array([size for _, size in samples])
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            report[name] = {
+                'calls': len(samples),
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+                'max_ms': round(float(latencies.max()), 2),
+                'throughput_per_s': round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+                'mean_bytes': int(sizes.mean()),
+                'total_bytes': int(sizes.sum())
+            }
+        return report
+
+
+def clear_caches():
+    """Empty the response and time series caches so the next calls go upstream"""
+    from utils.api_client import timeseries_store
+    from utils.cache import response_cache
+
+    response_cache.clear()
+    shutil.rmtree(timeseries_store.directory, ignore_errors=True)
+
+
+def run_scenario(name, callbacks, backend, gibs, args):
+    from data.regions import REGIONS_DATA
+    from utils.config import FIRST_YEAR, LAST_YEAR
+
+    regions = list(REGIONS_DATA)
+    years = list(range(FIRST_YEAR, LAST_YEAR + 1))
+    recorder = Recorder()
+
+    if name in ('cold', 'animation'):
+        clear_caches()
+    upstream_before = backend.calls
+    tiles_before = gibs.calls
+    started = time.perf_counter()
+
+    if name in ('cold', 'warm'):
+        session = Session(callbacks, regions[0], args.chart_mode, args.instruments)
+        for region in regions:
+            for year in years:
+                session.show(region, year, recorder)
+    else:
+        def play(index):
+            session = Session(callbacks, regions[index % len(regions)], args.chart_mode, args.instruments)
+            for _ in range(args.loops):
+                for year in years:
+                    session.show(session.values[('region-search', 'value')], year, recorder)
+
+        with ThreadPoolExecutor(args.sessions) as executor:
+            list(executor.map(play, range(args.sessions)))
+
+    wall = time.perf_counter() - started
+    return {
+        'scenario': name,
+        'sessions': args.sessions if name == 'animation' else 1,
+        'wall_s': round(wall, 3),
+        'upstream_calls': backend.calls - upstream_before,
+        'tile_fetches': gibs.calls - tiles_before,
+        'callbacks': recorder.summary(wall)
+    }
+
+
+def print_report(reports, args):
+    print(f"Fake Meteomatics latency {args.latency_ms} ms ±{args.jitter_ms} ms, "
+          f"fake tile latency {args.tile_latency_ms} ms, "
+          f"chart mode '{args.chart_mode}', instruments {args.instruments}")
+    header = f"  {'callback':<28}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>10}{'bytes':>10}"
+    for config, results in reports.items():
+        print(f"\n=== {config} configuration ===")
+        print_results(results, header)
+
+
+def print_results(results, header):
+    for result in results:
+        print(f"\n{result['scenario']} ({result['sessions']} session(s)): {result['wall_s']} s wall, "
+              f"{result['upstream_calls']} upstream queries, {result['tile_fetches']} tile fetches")
+        print(header)
+        for name, stats in result['callbacks'].items():
+            label = 'update_view_mode' if name == VIEW_CALLBACK else 'update_weather_graphs'
+            print(f"  {label:<28}{stats['calls']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                  f"{stats['p99_ms']:>10.1f}{stats['throughput_per_s']:>10.1f}{stats['mean_bytes']:>10}")
+
+
+def run_config(config, args):
+    """Run the scenarios in this interpreter with one configuration applied"""
+    # Configure the app before it is imported: throwaway caches, the
+    # configuration's overrides, and no local rate limit so the fake
+    # latency is what gets measured
+    cache_dir = tempfile.mkdtemp(prefix='callback-benchmark-')
+    os.environ.update({'CACHE_DIR': cache_dir, 'HISTORY_BACKEND': 'sqlite'})
+    os.environ.update(CONFIGS[config])
+    os.environ.setdefault('LOG_LEVEL', 'INFO' if args.verbose else 'WARNING')
+    os.environ.setdefault('METEOMATICS_RATE_PER_SECOND', '1000000')
+    os.environ.setdefault('METEOMATICS_BURST', '1000000')
+    sys.path.insert(0, ROOT)
+
+    import utils.api_client as api_client
+    import utils.co_sampler as co_sampler
+    import utils.tile_proxy as tile_proxy
+    from utils.config import BACKGROUND_POLL_MS
+
+    backend = FakeMeteomatics(args.latency_ms, args.jitter_ms)
+    gibs = FakeGibs(args.tile_latency_ms)
+    api_client.meteomatics_api = lambda: backend
+    tile_proxy._refresh_tile = gibs.refresh_tile
+    co_sampler._colormap_xml = gibs.colormap_xml
+
+    scenarios = ['cold', 'warm', 'animation'] if args.scenario == 'all' else [args.scenario]
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            from app import app
+            from utils.background import background_manager
+            if config == 'background' and background_manager is None:
+                raise SystemExit("The background configuration needs diskcache installed")
+            callbacks = CallbackClient(app, BACKGROUND_POLL_MS / 1000)
+            if args.scenario == 'warm':
+                run_scenario('cold', callbacks, backend, gibs, args)
+            return [run_scenario(name, callbacks, backend, gibs, args) for name in scenarios]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def forwarded_arguments(arguments):
+    """Command line without --config and --json, for one configuration per interpreter"""
+    forwarded = []
+    skip = False
+    for argument in arguments:
+        if skip:
+            skip = False
+        elif argument == '--config':
+            skip = True
+        elif not argument.startswith('--config=') and argument != '--json':
+            forwarded.append(argument)
+    return forwarded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', choices=list(CONFIGS) + ['all'], default='default')
+    parser.add_argument('--scenario', choices=['cold', 'warm', 'animation', 'all'], default='all')
+    parser.add_argument('--latency-ms', type=float, default=150, help="fake upstream latency per query")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="uniform ± jitter added to the latency")
+    parser.add_argument('--tile-latency-ms', type=float, default=50, help="fake GIBS latency per tile")
+    parser.add_argument('--sessions', type=int, default=8, help="concurrent sessions in the animation scenario")
+    parser.add_argument('--loops', type=int, default=1, help="2016-2024 loops each animation session plays")
+    parser.add_argument('--chart-mode', choices=['yearly', 'season', 'year'], default='yearly')
+    parser.add_argument('--instruments', nargs='+', default=['modis', 'mopitt'])
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="keep the application's own output")
+    args = parser.parse_args()
+
+    if args.config == 'all':
+        # Settings are read at import time, so every configuration gets a fresh interpreter
+        reports = {}
+        for config in CONFIGS:
+            command = [sys.executable, os.path.abspath(__file__)] + forwarded_arguments(sys.argv[1:]) + [
+                '--config', config, '--json']
+            completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+            reports.update(json.loads(completed.stdout))
+    else:
+        reports = {args.config: run_config(args.config, args)}
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_report(reports, args)
+
+
+if __name__ == "__main__":
+    main()
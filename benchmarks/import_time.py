@@ -0,0 +1,141 @@
+# benchmarks/import_time.py
+"""Startup benchmark: import time of app.py and latency of the first requests
+
+Each run starts a fresh interpreter so nothing is shared between runs:
+
+    python benchmarks/import_time.py --runs 5
+    python benchmarks/import_time.py --json --max-import-ms 2500
+
+The import phase is measured with `python -X importtime -c "import app"`
+and reported per top-level package, so a new heavy import shows up by name.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paths every page load requests before the first callback fires
+FIRST_REQUEST_PATHS = ['/', '/_dash-layout', '/_dash-dependencies']
+
+FIRST_REQUEST_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.server.test_client()
+timings = {'import_ms': (imported - started) * 1000}
+for path in %r:
+    request_started = time.perf_counter()
+    response = client.get(path)
+    timings[path] = {'ms': (time.perf_counter() - request_started) * 1000,
+                     'status': response.status_code, 'bytes': len(response.data)}
+print(json.dumps(timings))
+"""
+
+
+def _environment():
+    env = dict(os.environ)
+    # Keep the benchmark away from upstream APIs and the real caches
+    env.setdefault('WARMUP_ON_START', 'False')
+    env.setdefault('CACHE_DIR', os.path.join(ROOT, '.cache', 'benchmark'))
+    return env
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (total µs of app, {package: µs})
+
+    Per-package figures add up the self time of every module of a top-level
+    package, so a package is never charged for the dependencies it imports.
+    """
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        if not self_time.strip().isdigit():
+            continue  # header line
+        module = name.strip()
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_time)
+        if module == 'app':
+            total = int(cumulative)
+    return total, packages
+
+
+def measure_imports():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, env=_environment(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import app failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure_first_requests():
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST_SCRIPT % (FIRST_REQUEST_PATHS,)],
+                            cwd=ROOT, env=_environment(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"first request failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs):
+    import_totals, packages = [], {}
+    first_requests = []
+    for _ in range(runs):
+        total, measured = measure_imports()
+        import_totals.append(total / 1000)
+        for package, micros in measured.items():
+            packages.setdefault(package, []).append(micros / 1000)
+        first_requests.append(measure_first_requests())
+
+    return {
+        'runs': runs,
+        'import_ms': statistics.median(import_totals),
+        'packages_ms': {package: statistics.median(values) for package, values in packages.items()},
+        'first_request_ms': {
+            path: statistics.median(timing[path]['ms'] for timing in first_requests)
+            for path in FIRST_REQUEST_PATHS
+        },
+        'wall_import_ms': statistics.median(timing['import_ms'] for timing in first_requests)
+    }
+
+
+def print_report(report, top):
+    print(f"Median of {report['runs']} run(s)")
+    print(f"  import app (-X importtime): {report['import_ms']:8.1f} ms")
+    print(f"  import app (wall clock):    {report['wall_import_ms']:8.1f} ms")
+    print("\nSlowest packages (self time of their modules):")
+    ranked = sorted(report['packages_ms'].items(), key=lambda item: item[1], reverse=True)
+    for package, ms in ranked[:top]:
+        print(f"  {package:<30} {ms:8.1f} ms")
+    print("\nFirst requests:")
+    for path, ms in report['first_request_ms'].items():
+        print(f"  GET {path:<26} {ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters to measure (median is reported)")
+    parser.add_argument('--top', type=int, default=15, help="number of packages to list")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--max-import-ms', type=float, help="exit with status 1 if the import takes longer")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+
+    if args.max_import_ms is not None and report['import_ms'] > args.max_import_ms:
+        print(f"Import time {report['import_ms']:.1f} ms exceeds {args.max_import_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
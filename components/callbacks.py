@@ -1,31 +1,117 @@
 # components/callbacks.py
-from dash import Output, Input, State, callback_context, no_update
-import dash_leaflet as dl
-from data.regions import REGIONS_DATA, REGION_DESCRIPTIONS
-from utils.api_client import get_meteomatics_data
-from utils.helpers import make_modis_url, make_mopitt_url
+import logging
+import uuid
+from datetime import datetime, timezone
+from dash import Output, Input, State, ClientsideFunction, callback_context, no_update
+from data.catalog import catalog, get_region, resolve_region, parse_point_name, point_region_name
+from utils.api_client import (
+    get_meteomatics_data,
+    get_meteomatics_data_batch,
+    get_meteomatics_timeseries,
+    timeseries_window
+)
+from utils.config import (
+    TIMESERIES_MAX_POINTS, CO_SOURCE, POINT_GRID_RESOLUTION, FIRST_YEAR, LAST_YEAR, BACKGROUND_POLL_MS
+)
+from utils.co_sampler import sample_co, sample_co_values, CO_COLUMN_UNITS
+from utils.downsample import downsample_columns
+from utils.history_store import history_store
+from utils.helpers import snap_to_grid
+from utils.point_queries import point_batcher, SUPERSEDED
+from utils.prefetch import prefetcher
+from utils.background import background_manager
+from utils.metrics import timed_callback
+from utils.field_overlay import FIELDS
+from components.map_layers import build_layer_specs, update_tile_layers
 from components.graphs import (
-    create_temperature_gauge_horizontal, 
-    create_precipitation_bar_horizontal,
-    create_co_gauge_horizontal,
+    update_gauge,
+    gauge_frames,
     create_empty_gauge_horizontal,
-    create_comparison_chart,
+    update_comparison_chart,
+    create_timeseries_chart,
     create_empty_comparison_chart
 )
 
-# Historical data storage (could be moved to a database)
-historical_data = {}
+logger = logging.getLogger(__name__)
+
+# Line series keep their shape with LTTB, precipitation keeps its peaks
+TIMESERIES_DOWNSAMPLING = {
+    't_2m:C': 'lttb',
+    'wind_speed_10m:ms': 'lttb',
+    'precip_1h:mm': 'minmax'
+}
+
+TIMESERIES_PERIOD_LABELS = {
+    'season': 'Jun-Aug',
+    'year': 'Jan-Dec'
+}
+
+def co_units():
+    """Units of the CO values shown for the configured CO source"""
+    return CO_COLUMN_UNITS if CO_SOURCE == 'mopitt' else 'μg/m³'
+
+def build_weather_result(region_name, lat, lon, year, weather_data, include_co=False):
+    """Turn raw API values into the record used by the gauges and history"""
+    temperature = weather_data.get('t_2m:C', 'N/A')
+    precipitation = weather_data.get('precip_1h:mm', 'N/A')
+    wind_speed = weather_data.get('wind_speed_10m:ms', 'N/A')
+    if 'co_column' in weather_data:
+        co_concentration = weather_data['co_column']
+    else:
+        co_concentration = weather_data.get('co:ugm3', 'N/A') if include_co else None
+
+    result = {
+        'temperature': round(temperature, 1) if temperature != 'N/A' else None,
+        'precipitation': round(precipitation * 24, 1) if precipitation != 'N/A' else None,
+        'wind_speed': round(wind_speed, 1) if wind_speed != 'N/A' else None,
+        'co_concentration': round(co_concentration, 2) if co_concentration != 'N/A' and include_co else None,
+        'region': region_name,
+        'co_units': co_units(),
+        'coordinates': f"Lat: {lat:.4f}, Lon: {lon:.4f}",
+        'year': year,
+        'stale': weather_data.get('stale', False),
+        'valid_time': weather_data.get('valid_time'),
+        'fetched_at': weather_data.get('fetched_at'),
+        'error': False
+    }
+
+    return result
 
-def get_weather_data(region_name, year, include_co=False):
-    """Get meteorological data from Meteomatics API"""
+def format_freshness(data):
+    """'As of' label for current-year values; empty for past years"""
+    if data.get('year', 0) < datetime.now(timezone.utc).year or not data.get('valid_time'):
+        return ""
+
+    label = f"🕒 As of {datetime.fromisoformat(data['valid_time']):%H:%M} UTC"
+    if data.get('fetched_at'):
+        label += f" (updated {datetime.fromtimestamp(data['fetched_at'], timezone.utc):%H:%M})"
+    if data.get('stale'):
+        label += " ⚠️ refresh failed"
+    return label
+
+def get_weather_data(region_name, year, include_co=False, session_id=None):
+    """Get meteorological data from Meteomatics API
+
+    When a session_id is given the result is also recorded in the
+    historical store for the comparative chart. Clicked map points are
+    debounced and batched; a click replaced by a newer one of the same
+    session returns a 'superseded' error.
+    """
     try:
-        region = REGIONS_DATA.get(region_name, REGIONS_DATA['Beijing China'])
+        region = get_region(region_name)
         lat, lon = region['lat'], region['lon']
         
-        print(f"Getting data for {region_name} ({lat}, {lon}) in year {year}")
-        print(f"Include CO in data: {include_co}")
+        logger.info("Getting data for %s (%s, %s) in year %s", region_name, lat, lon, year)
+        logger.debug("Include CO in data: %s", include_co)
         
-        weather_data = get_meteomatics_data(lat, lon, year, include_co)
+        # With the MOPITT source CO comes from the map tiles, not a paid API parameter
+        use_mopitt = include_co and CO_SOURCE == 'mopitt'
+        if parse_point_name(region_name):
+            weather_data = point_batcher.fetch(lat, lon, year, include_co and not use_mopitt, session_id)
+            if weather_data is SUPERSEDED:
+                return {'error': True, 'superseded': True, 'message': 'Replaced by a newer click'}
+        else:
+            weather_data = get_meteomatics_data(lat, lon, year, include_co and not use_mopitt)
         
         if not weather_data:
             return {
@@ -33,141 +119,191 @@ def get_weather_data(region_name, year, include_co=False):
                 'message': f'Error getting data from Meteomatics API for year {year}'
             }
         
-        temperature = weather_data.get('t_2m:C', 'N/A')
-        precipitation = weather_data.get('precip_1h:mm', 'N/A')
-        wind_speed = weather_data.get('wind_speed_10m:ms', 'N/A')
-        co_concentration = weather_data.get('co:ugm3', 'N/A') if include_co else None
+        if use_mopitt:
+            co_column = sample_co(lat, lon, year)
+            weather_data['co_column'] = co_column if co_column is not None else 'N/A'
         
-        result = {
-            'temperature': round(temperature, 1) if temperature != 'N/A' else None,
-            'precipitation': round(precipitation * 24, 1) if precipitation != 'N/A' else None,
-            'wind_speed': round(wind_speed, 1) if wind_speed != 'N/A' else None,
-            'co_concentration': round(co_concentration, 2) if co_concentration != 'N/A' and include_co else None,
-            'region': region_name,
-            'coordinates': f"Lat: {lat:.4f}, Lon: {lon:.4f}",
-            'year': year,
-            'error': False
-        }
+        result = build_weather_result(region_name, lat, lon, year, weather_data, include_co)
         
         # Store historical data for comparative chart
-        if region_name not in historical_data:
-            historical_data[region_name] = {}
-        
-        historical_data[region_name][year] = {
-            'temperature': result['temperature'],
-            'precipitation': result['precipitation'],
-            'co_concentration': result['co_concentration']
-        }
+        if session_id:
+            history_store.record(session_id, region_name, year, result)
         
         return result
         
     except Exception as e:
-        print(f"Error getting meteorological data: {e}")
+        logger.exception("Error getting meteorological data: %s", e)
         return {
             'error': True,
             'message': f'Error: {str(e)}'
         }
 
+def get_weather_data_batch(region_names, years, include_co=False, session_id=None):
+    """Get meteorological data for every (region, year) pair in one batch
+
+    Returns a dict keyed by (region_name, year) with the same records as
+    get_weather_data.
+    """
+    points = {}
+    for region_name in region_names:
+        region = get_region(region_name)
+        for year in years:
+            points[(region_name, year)] = (region['lat'], region['lon'], year)
+
+    logger.info("Getting batch data for %d regions and %d years", len(region_names), len(years))
+    use_mopitt = include_co and CO_SOURCE == 'mopitt'
+    fetched = get_meteomatics_data_batch(list(points.values()), include_co and not use_mopitt)
+
+    if use_mopitt:
+        # One tile pass per year samples every region at once
+        for year in years:
+            year_points = [(lat, lon) for lat, lon, point_year in points.values() if point_year == year]
+            try:
+                values = sample_co_values(year_points, year)
+            except Exception as e:
+                logger.error("Error sampling MOPITT CO: %s", e)
+                values = [float('nan')] * len(year_points)
+            for (lat, lon), value in zip(year_points, values):
+                weather_data = fetched.get((lat, lon, year))
+                if weather_data:
+                    weather_data['co_column'] = float(value) if value == value else 'N/A'
+
+    results = {}
+    for (region_name, year), (lat, lon, _) in points.items():
+        weather_data = fetched.get((lat, lon, year))
+        if not weather_data:
+            results[(region_name, year)] = {
+                'error': True,
+                'message': f'Error getting data from Meteomatics API for year {year}'
+            }
+            continue
+        result = build_weather_result(region_name, lat, lon, year, weather_data, include_co)
+        if session_id:
+            history_store.record(session_id, region_name, year, result)
+        results[(region_name, year)] = result
+
+    return results
+
+def build_animation_bundle(region_name, instrument_combination, mode, field, bounds, chart_mode,
+                           session_id=None):
+    """Everything the browser needs to play FIRST_YEAR..LAST_YEAR without the server
+
+    All years are fetched in one batch. Gauges are sent as one template per
+    kind plus the values of each year, the map as the layer specs of each
+    year and the yearly comparison chart once, already holding every year.
+    Hourly time-series charts differ per year, so those chart modes get no
+    bundle (None) and keep the server-rendered frames. The key lets the
+    browser tell when the bundle no longer matches the controls.
+    """
+    if chart_mode in TIMESERIES_PERIOD_LABELS:
+        return None
+
+    years = list(range(FIRST_YEAR, LAST_YEAR + 1))
+    include_co = 'mopitt' in instrument_combination
+    fetched = get_weather_data_batch([region_name], years, include_co, session_id)
+    records = [fetched[(region_name, year)] for year in years]
+
+    def values(key):
+        return [None if record.get('error') else record[key] for record in records]
+
+    gauges = {
+        'temperature': gauge_frames('temperature', values('temperature')),
+        'precipitation': gauge_frames('precipitation', values('precipitation')),
+        # Without MOPITT the CO graph keeps its "Select MOPITT" placeholder
+        'co': gauge_frames('co', values('co_concentration'), co_units()) if include_co else None
+    }
+
+    series = {record['year']: record for record in records if not record.get('error')}
+    comparison, comparison_state = update_comparison_chart(region_name, series, LAST_YEAR, None, co_units())
+
+    return {
+        'id': uuid.uuid4().hex,
+        'key': [region_name, instrument_combination, mode, field, chart_mode],
+        'years': years,
+        'gauges': gauges,
+        'layers': [build_layer_specs(mode, year, instrument_combination, field, bounds)[0] for year in years],
+        'comparison': comparison,
+        'comparison_state': comparison_state,
+        'freshness': [format_freshness(record) if not record.get('error') else "" for record in records]
+    }
+
+def get_timeseries_views(region_name, year, period):
+    """Get the downsampled hourly series of a region for one period of a year"""
+    region = get_region(region_name)
+    startdate, enddate = timeseries_window(year, period)
+    if enddate <= startdate:
+        return None
+    columns = get_meteomatics_timeseries(region['lat'], region['lon'], startdate, enddate)
+    if columns is None:
+        return None
+    return downsample_columns(columns, TIMESERIES_MAX_POINTS, TIMESERIES_DOWNSAMPLING)
+
 def register_callbacks(app):
     """Register all callbacks in the application"""
     
-    # Callback to show/hide chart
-    @app.callback(
+    # Callback to show/hide chart (runs in the browser, see assets/clientside.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='toggleChart'),
         [Output('comparison-chart-container', 'style'),
-         Output('toggle-chart-button', 'children')],
+         Output('toggle-chart-button', 'children'),
+         Output('chart-visibility-store', 'data')],
         [Input('toggle-chart-button', 'n_clicks')],
         [State('chart-visibility-store', 'data')]
     )
-    def toggle_chart(n_clicks, visibility_data):
-        if n_clicks is None:
-            return {
-                'position': 'absolute',
-                'top': '240px',
-                'left': '20px',
-                'zIndex': 1000,
-                'transition': 'all 0.3s ease-in-out'
-            }, "📈 Hide Chart"
-        
-        chart_visible = not visibility_data['chart_visible']
-        
-        if chart_visible:
-            return {
-                'position': 'absolute',
-                'top': '240px',
-                'left': '20px',
-                'zIndex': 1000,
-                'transition': 'all 0.3s ease-in-out'
-            }, "📈 Hide Chart"
-        else:
-            return {
-                'position': 'absolute',
-                'top': '240px',
-                'left': '-850px',
-                'zIndex': 1000,
-                'transition': 'all 0.3s ease-in-out'
-            }, "📈 Show Chart"
-
-    # Callback to update visibility store
-    @app.callback(
-        Output('chart-visibility-store', 'data'),
-        [Input('toggle-chart-button', 'n_clicks')],
-        [State('chart-visibility-store', 'data')]
-    )
-    def update_visibility_store(n_clicks, visibility_data):
-        if n_clicks is None:
-            return {'chart_visible': True}
-        
-        return {'chart_visible': not visibility_data['chart_visible']}
 
-    # Callback to update map
+    # Callback to update map (only changed layer props are sent)
     @app.callback(
         [Output("map", "children"),
+         Output("map-layers-store", "data"),
          Output("combination-indicator", "children")],
         [Input("view-mode", "value"),
          Input("year", "value"),
-         Input("instrument-combination", "value")]
+         Input("instrument-combination", "value"),
+         Input("field-overlay", "value"),
+         Input("map", "bounds")],
+        [State('map-layers-store', 'data'),
+         State('animation-store', 'data'),
+         State('session-id', 'data')]
     )
-    def update_view_mode(mode, year, instrument_combination):
-        print(f"Updating map - Combination: {instrument_combination}, Year: {year}")
-        
-        layers = []
-        instrument_names = []
-        
-        if 'modis' in instrument_combination:
-            modis_url = make_modis_url(year)
-            modis_layer = dl.TileLayer(url=modis_url, attribution="NASA GIBS - MODIS Terra")
-            layers.append(modis_layer)
-            instrument_names.append("MODIS")
-        
-        if 'mopitt' in instrument_combination:
-            mopitt_url = make_mopitt_url(year)
-            mopitt_layer = dl.TileLayer(
-                url=mopitt_url, 
-                attribution="NASA GIBS - MOPITT/Terra",
-                opacity=0.6
-            )
-            layers.append(mopitt_layer)
-            instrument_names.append("MOPITT")
+    def update_view_mode(mode, year, instrument_combination, field, bounds, previous_specs, animation,
+                         session_id):
+        # The slider stays put while the browser plays the animation bundle
+        if animation and animation.get('is_playing'):
+            year = animation['current_year']
+        logger.debug("Updating map - Combination: %s, Year: %s", instrument_combination, year)
         
-        if not layers:
-            modis_url = make_modis_url(year)
-            modis_layer = dl.TileLayer(url=modis_url, attribution="NASA GIBS - MODIS Terra")
-            layers.append(modis_layer)
-            instrument_names.append("MODIS")
+        # Keep the prefetcher ahead of the playhead while the animation runs
+        prefetcher.advance(session_id, year)
         
-        if mode == 'with-borders':
-            contours = dl.TileLayer(
-                url="https://server.arcgisonline.com/ArcGIS/rest/services/Reference/World_Boundaries_and_Places/MapServer/tile/{z}/{y}/{x}",
-                attribution="Esri"
-            )
-            layers.append(contours)
+        specs, instrument_names = build_layer_specs(mode, year, instrument_combination, field, bounds)
+        children = update_tile_layers(previous_specs, specs)
+        if children is no_update:
+            # Panning without a field overlay changes nothing
+            return no_update, no_update, no_update
         
         if len(instrument_names) == 1:
             indicator_text = f"📡 Instrument: {instrument_names[0]}"
         else:
             indicator_text = f"🛰️ Combination: {', '.join(instrument_names)}"
+        if field in FIELDS:
+            indicator_text += f" + {FIELDS[field]['label']} field"
         
-        return layers, indicator_text
+        return children, specs, indicator_text
+
+    # Callback to search the location catalog as the user types
+    @app.callback(
+        Output("region-search", "options"),
+        Input("region-search", "search_value"),
+        State("region-search", "value")
+    )
+    def search_regions(search_value, region):
+        if not search_value:
+            return no_update
+        names = catalog.search(search_value)
+        # Keep the selected city in the options or the dropdown would clear it
+        if region and region not in names:
+            names.append(region)
+        return catalog.options(names)
 
     # Callback to update location
     @app.callback(
@@ -175,89 +311,221 @@ def register_callbacks(app):
         Input("region-search", "value")
     )
     def update_location(region):
-        if region:
-            region_data = REGIONS_DATA[region]
-            info = f"📍 {region} | {REGION_DESCRIPTIONS.get(region, '')}"
+        region_data = resolve_region(region)
+        if region_data:
+            info = f"📍 {region}"
+            if region_data['description']:
+                info += f" | {region_data['description']}"
+            if region_data['zoom'] is None:
+                # Clicked points keep the map where the user left it
+                return no_update, info
             return {'center': [region_data['lat'], region_data['lon']], 'zoom': region_data['zoom']}, info
         return no_update, ""
 
-    # Callbacks for animation
+    # Callback to query any point clicked on the map, snapped to the model grid
     @app.callback(
+        [Output("region-search", "options", allow_duplicate=True),
+         Output("region-search", "value")],
+        Input("map", "clickData"),
+        prevent_initial_call=True
+    )
+    def select_clicked_point(click_data):
+        latlng = (click_data or {}).get('latlng')
+        if not latlng:
+            return no_update, no_update
+        lat, lon = snap_to_grid(latlng['lat'], latlng['lng'], POINT_GRID_RESOLUTION)
+        name = point_region_name(lat, lon)
+        return catalog.options([name]), name
+
+    # Callbacks for animation (run in the browser; the interval only ticks while playing)
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='controlAnimation'),
         [Output('animation-store', 'data'),
-         Output('animation-status', 'children')],
+         Output('animation-status', 'children'),
+         Output('animation-interval', 'disabled'),
+         Output('year', 'value')],
         [Input('play-animation', 'n_clicks'),
          Input('pause-animation', 'n_clicks')],
-        [State('animation-store', 'data')]
+        [State('animation-store', 'data'),
+         State('year', 'value')]
     )
-    def control_animation(play_clicks, pause_clicks, data):
-        ctx = callback_context
-        if not ctx.triggered:
-            return data, "⏹️ Stopped"
-        
-        trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
+
+    # Callback to warm data and tiles ahead of the animation
+    @app.callback(
+        Output('prefetch-store', 'data'),
+        [Input('play-animation', 'n_clicks'),
+         Input('pause-animation', 'n_clicks'),
+         Input('region-search', 'value')],
+        [State('prefetch-store', 'data'),
+         State('year', 'value'),
+         State('instrument-combination', 'value'),
+         State('view-mode', 'value'),
+         State('map', 'bounds'),
+         State('map', 'zoom'),
+         State('session-id', 'data')],
+        prevent_initial_call=True
+    )
+    def control_prefetch(play_clicks, pause_clicks, region, prefetch_data, year,
+                         instrument_combination, mode, bounds, zoom, session_id):
+        trigger_id = callback_context.triggered[0]['prop_id'].split('.')[0]
         
-        if trigger_id == 'play-animation':
-            data['is_playing'] = True
-            status = f"▶️ Playing... Year: {data['current_year']}"
-            return data, status
+        # A region change while playing restarts the plan for the new region
+        should_run = trigger_id == 'play-animation' or (
+            trigger_id == 'region-search' and prefetch_data.get('active'))
         
-        elif trigger_id == 'pause-animation':
-            data['is_playing'] = False
-            status = f"⏸️ Paused - Year: {data['current_year']}"
-            return data, status
+        if should_run and region:
+            prefetcher.start(session_id, region, year, instrument_combination,
+                             mode == 'with-borders', bounds, zoom)
+            # Frames played from the bundle never reach the server, so plan the whole loop now
+            prefetcher.advance(session_id, year, LAST_YEAR - FIRST_YEAR)
+            return {'active': True}
         
-        return data, "⏹️ Stopped"
+        prefetcher.stop(session_id)
+        return {'active': False}
 
+    # Callback to preload every year of the animation in one server pass
     @app.callback(
-        [Output('year', 'value'),
-         Output('animation-store', 'data', allow_duplicate=True)],
+        Output('animation-bundle', 'data'),
+        [Input('play-animation', 'n_clicks'),
+         Input('region-search', 'value'),
+         Input('instrument-combination', 'value'),
+         Input('view-mode', 'value'),
+         Input('field-overlay', 'value'),
+         Input('chart-mode', 'value'),
+         Input('map', 'bounds')],
+        [State('animation-store', 'data'),
+         State('animation-bundle', 'data'),
+         State('session-id', 'data')],
+        prevent_initial_call=True,
+        **({'background': True, 'interval': BACKGROUND_POLL_MS} if background_manager is not None else {})
+    )
+    @timed_callback('animation-bundle.data')
+    def preload_animation(play_clicks, region, instrument_combination, mode, field, chart_mode, bounds,
+                          animation, bundle, session_id):
+        trigger_id = callback_context.triggered[0]['prop_id'].split('.')[0]
+        
+        if trigger_id != 'play-animation' and not (animation or {}).get('is_playing'):
+            # Controls changed while paused: the next Play builds a fresh bundle
+            return None if bundle is not None else no_update
+        if trigger_id == 'map' and field not in FIELDS:
+            # Only the field overlay depends on the viewport
+            return no_update
+        if not region or chart_mode in TIMESERIES_PERIOD_LABELS:
+            # Hourly charts are rendered by the server frame by frame
+            return None
+        
+        logger.info("Preloading animation of %s", region)
+        return build_animation_bundle(region, instrument_combination, mode, field, bounds, chart_mode,
+                                      session_id)
+
+    # The frame advancer draws frames from the bundle in the browser and only
+    # moves the year slider (a server round trip) while no bundle matches
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='updateAnimationFrame'),
+        [Output('year', 'value', allow_duplicate=True),
+         Output('animation-store', 'data', allow_duplicate=True),
+         Output('animation-status', 'children', allow_duplicate=True),
+         Output('temperature-graph', 'figure', allow_duplicate=True),
+         Output('precipitation-graph', 'figure', allow_duplicate=True),
+         Output('co-graph', 'figure', allow_duplicate=True),
+         Output('comparison-chart', 'figure', allow_duplicate=True),
+         Output('gauge-kinds-store', 'data', allow_duplicate=True),
+         Output('comparison-state-store', 'data', allow_duplicate=True),
+         Output('data-freshness', 'children', allow_duplicate=True),
+         Output('map', 'children', allow_duplicate=True),
+         Output('map-layers-store', 'data', allow_duplicate=True)],
         [Input('animation-interval', 'n_intervals')],
-        [State('animation-store', 'data')],
+        [State('animation-store', 'data'),
+         State('animation-bundle', 'data'),
+         State('region-search', 'value'),
+         State('instrument-combination', 'value'),
+         State('view-mode', 'value'),
+         State('field-overlay', 'value'),
+         State('chart-mode', 'value')],
         prevent_initial_call=True
     )
-    def update_animation_frame(n_intervals, data):
-        if data['is_playing']:
-            current_year = data['current_year'] + 1
-            if current_year > 2024:
-                current_year = 2016
-            
-            data['current_year'] = current_year
-            return current_year, data
-        
-        return no_update, data
 
-    # Main callback to update charts
+    # Main callback to update charts. With BACKGROUND_CALLBACKS the upstream
+    # fetch runs in a DiskCache job instead of the request thread; a new
+    # region or year re-triggers the callback, which cancels the running job.
+    if background_manager is not None:
+        background_options = dict(
+            background=True,
+            # The renderer polls for the result; its 1 s default would dominate cache hits
+            interval=BACKGROUND_POLL_MS,
+            running=[(Output('gauges-row', 'style'),
+                      {'opacity': 0.4, 'transition': 'opacity 0.2s'},
+                      {'opacity': 1, 'transition': 'opacity 0.2s'})],
+            progress=[Output('weather-status', 'children')]
+        )
+    else:
+        background_options = {}
+    
     @app.callback(
         [Output('temperature-graph', 'figure'),
          Output('precipitation-graph', 'figure'),
          Output('co-graph', 'figure'),
-         Output('comparison-chart', 'figure')],
+         Output('comparison-chart', 'figure'),
+         Output('gauge-kinds-store', 'data'),
+         Output('comparison-state-store', 'data'),
+         Output('data-freshness', 'children')],
         [Input("region-search", "value"), 
          Input("year", "value"),
-         Input("instrument-combination", "value")]
+         Input("instrument-combination", "value"),
+         Input("chart-mode", "value")],
+        [State('session-id', 'data'),
+         State('gauge-kinds-store', 'data'),
+         State('comparison-state-store', 'data')],
+        **background_options
     )
-    def update_weather_graphs(region, year, instrument_combination):
+    def update_weather_graphs(*args):
+        if background_manager is not None:
+            return fetch_weather_graphs(*args)
+        return fetch_weather_graphs(lambda status: None, *args)
+    
+    @timed_callback('temperature-graph.figure')
+    def fetch_weather_graphs(set_progress, region, year, instrument_combination, chart_mode, session_id,
+                             gauge_kinds, comparison_state):
+        no_gauges = [None, None, None]
         if not region:
             empty_fig = create_empty_gauge_horizontal("", "Select region")
-            return empty_fig, empty_fig, empty_fig, create_empty_comparison_chart()
+            return empty_fig, empty_fig, empty_fig, create_empty_comparison_chart(), no_gauges, None, ""
         
         include_co = 'mopitt' in instrument_combination
-        print(f"Updating data - Include CO: {include_co}")
+        logger.debug("Updating data - Include CO: %s", include_co)
         
-        data = get_weather_data(region, year, include_co)
+        set_progress(f"⏳ Fetching {region} {year}...")
+        data = get_weather_data(region, year, include_co, session_id)
+        
+        if data.get('superseded'):
+            set_progress("")
+            return (no_update,) * 7
         
         if data.get('error'):
+            set_progress("")
             error_fig = create_empty_gauge_horizontal("Error", "Data unavailable")
-            return error_fig, error_fig, error_fig, create_empty_comparison_chart()
+            return error_fig, error_fig, error_fig, create_empty_comparison_chart(), no_gauges, None, ""
         
-        temp_fig = create_temperature_gauge_horizontal(data['temperature'])
-        precip_fig = create_precipitation_bar_horizontal(data['precipitation'])
+        # Gauges already showing the same kind only receive the new value
+        previous_kinds = gauge_kinds or no_gauges
+        temp_fig, temp_kind = update_gauge('temperature', data['temperature'], previous_kinds[0])
+        precip_fig, precip_kind = update_gauge('precipitation', data['precipitation'], previous_kinds[1])
         
         if include_co:
-            co_fig = create_co_gauge_horizontal(data['co_concentration'])
+            co_fig, co_kind = update_gauge('co', data['co_concentration'], previous_kinds[2], data['co_units'])
         else:
-            co_fig = create_empty_gauge_horizontal("🌫️ CO", "Select MOPITT")
+            co_fig, co_kind = create_empty_gauge_horizontal("🌫️ CO", "Select MOPITT"), None
         
-        comparison_fig = create_comparison_chart(region, historical_data)
+        if chart_mode in TIMESERIES_PERIOD_LABELS:
+            set_progress(f"⏳ Fetching hourly series for {year}...")
+            views = get_timeseries_views(region, year, chart_mode)
+            comparison_fig = create_timeseries_chart(region, views, f"{TIMESERIES_PERIOD_LABELS[chart_mode]} {year}")
+            comparison_state = None
+        else:
+            # Only the fetched year is sent unless the region or CO axis changed
+            comparison_fig, comparison_state = update_comparison_chart(
+                region, history_store.get_series(session_id, region), year, comparison_state, co_units())
         
-        return temp_fig, precip_fig, co_fig, comparison_fig
\ No newline at end of file
+        set_progress("")
+        return (temp_fig, precip_fig, co_fig, comparison_fig,
+                [temp_kind, precip_kind, co_kind], comparison_state, format_freshness(data))
\ No newline at end of file
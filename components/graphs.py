@@ -1,12 +1,13 @@
 # components/graphs.py
+import copy
+import json
+from functools import lru_cache
+from dash import Patch, no_update
 import plotly.graph_objects as go
-import plotly.express as px
+from utils.config import FIRST_YEAR, LAST_YEAR
 
-def create_temperature_gauge_horizontal(temp_value):
-    """Create horizontal gauge chart for temperature"""
-    if temp_value == 'N/A' or temp_value is None:
-        return create_empty_gauge_horizontal("🌡️ Temperature", "N/A")
-    
+def _build_temperature_gauge(temp_value):
+    """Build the styled temperature gauge figure"""
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
         value = temp_value,
@@ -38,11 +39,8 @@ def create_temperature_gauge_horizontal(temp_value):
     )
     return fig
 
-def create_precipitation_bar_horizontal(precip_value):
-    """Create horizontal bar chart for precipitation"""
-    if precip_value == 'N/A' or precip_value is None:
-        return create_empty_bar_horizontal("🌧️ Precipitation", "N/A")
-    
+def _build_precipitation_bar(precip_value):
+    """Build the styled precipitation bar figure"""
     fig = go.Figure(go.Bar(
         x=[precip_value],
         y=[''],
@@ -74,27 +72,33 @@ def create_precipitation_bar_horizontal(precip_value):
     
     return fig
 
-def create_co_gauge_horizontal(co_value):
-    """Create horizontal gauge chart for CO concentration"""
-    if co_value == 'N/A' or co_value is None:
-        return create_empty_gauge_horizontal("🌫️ CO", "N/A")
+# Gauge scales for CO in surface concentration (Meteomatics) or column amount (MOPITT)
+CO_GAUGE_SCALES = {
+    'μg/m³': {'range': [0, 200], 'steps': [0, 50, 100, 150, 200]},
+    '10¹⁸ molec/cm²': {'range': [0, 4], 'steps': [0, 1.5, 2, 2.5, 4]}
+}
+
+def _build_co_gauge(co_value, units):
+    """Build the styled CO gauge figure for a units scale"""
+    scale = CO_GAUGE_SCALES[units]
+    edges = scale['steps']
     
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
         value = co_value,
         domain = {'x': [0, 1], 'y': [0, 1]},
-        title = {'text': "🌫️ CO (μg/m³)", 'font': {'size': 9, 'color': 'white'}},
+        title = {'text': f"🌫️ CO ({units})", 'font': {'size': 9, 'color': 'white'}},
         gauge = {
-            'axis': {'range': [0, 200], 'tickwidth': 1, 'tickcolor': "white", 'tickfont': {'color': 'white', 'size': 8}},
+            'axis': {'range': scale['range'], 'tickwidth': 1, 'tickcolor': "white", 'tickfont': {'color': 'white', 'size': 8}},
             'bar': {'color': "#e67e22"},
             'bgcolor': "rgba(0,0,0,0)",
             'borderwidth': 1,
             'bordercolor': "#e67e22",
             'steps': [
-                {'range': [0, 50], 'color': '#27ae60'},
-                {'range': [50, 100], 'color': '#f1c40f'},
-                {'range': [100, 150], 'color': '#e67e22'},
-                {'range': [150, 200], 'color': '#e74c3c'}],
+                {'range': [edges[0], edges[1]], 'color': '#27ae60'},
+                {'range': [edges[1], edges[2]], 'color': '#f1c40f'},
+                {'range': [edges[2], edges[3]], 'color': '#e67e22'},
+                {'range': [edges[3], edges[4]], 'color': '#e74c3c'}],
             'threshold': {
                 'line': {'color': "white", 'width': 2},
                 'thickness': 0.6,
@@ -109,6 +113,109 @@ def create_co_gauge_horizontal(co_value):
     )
     return fig
 
+# Prebuilt figure skeletons: styling is validated by Plotly once per kind and
+# every update only swaps the values at these paths of the first trace
+GAUGE_BUILDERS = {
+    'temperature': lambda units: _build_temperature_gauge(0),
+    'precipitation': lambda units: _build_precipitation_bar(0),
+    'co': lambda units: _build_co_gauge(0, units)
+}
+
+def _gauge_values(kind, value):
+    if kind == 'precipitation':
+        return {
+            ('x',): [value],
+            ('text',): [f"{value} mm"],
+            ('hovertemplate',): f"Precipitation: {value} mm<extra></extra>"
+        }
+    return {('value',): value, ('gauge', 'threshold', 'value'): value}
+
+@lru_cache(maxsize=None)
+def _figure_template(kind, units=None):
+    return json.loads(GAUGE_BUILDERS[kind](units).to_json())
+
+def _render_gauge(kind, value, units=None):
+    template = _figure_template(kind, units)
+    data = copy.deepcopy(template['data'])
+    for path, new_value in _gauge_values(kind, value).items():
+        target = data[0]
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = new_value
+    # The layout is shared, never mutated, between responses
+    return {'data': data, 'layout': template['layout']}
+
+def _patch_gauge(kind, value):
+    patch = Patch()
+    for path, new_value in _gauge_values(kind, value).items():
+        target = patch['data'][0]
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = new_value
+    return patch
+
+def gauge_kind(kind, units=None):
+    """Identifier of a gauge figure layout, used to know when a Patch applies"""
+    return f"{kind}:{units}" if units else kind
+
+def update_gauge(kind, value, previous_kind, units=None):
+    """Return (figure or Patch, shown kind) to display value on a gauge
+
+    When the graph already shows this kind of gauge only the value is sent
+    as a Patch; otherwise the full figure is rendered from its template.
+    """
+    if value == 'N/A' or value is None:
+        return EMPTY_GAUGES[kind](), None
+
+    shown_kind = gauge_kind(kind, units)
+    if previous_kind == shown_kind:
+        return _patch_gauge(kind, value), shown_kind
+    return _render_gauge(kind, value, units), shown_kind
+
+def gauge_frames(kind, values, units=None):
+    """A gauge template plus the value paths of every frame, for playback in the browser
+
+    Each frame is a list of [path, value] pairs to set in the first trace
+    of the template, or None where the empty gauge is shown instead.
+    """
+    frames = []
+    for value in values:
+        if value == 'N/A' or value is None:
+            frames.append(None)
+        else:
+            frames.append([[list(path), new_value] for path, new_value in _gauge_values(kind, value).items()])
+    return {
+        'kind': gauge_kind(kind, units),
+        'template': _figure_template(kind, units),
+        'empty': EMPTY_GAUGES[kind](),
+        'frames': frames
+    }
+
+def create_temperature_gauge_horizontal(temp_value):
+    """Create horizontal gauge chart for temperature"""
+    if temp_value == 'N/A' or temp_value is None:
+        return create_empty_gauge_horizontal("🌡️ Temperature", "N/A")
+    return _render_gauge('temperature', temp_value)
+
+def create_precipitation_bar_horizontal(precip_value):
+    """Create horizontal bar chart for precipitation"""
+    if precip_value == 'N/A' or precip_value is None:
+        return create_empty_bar_horizontal("🌧️ Precipitation", "N/A")
+    return _render_gauge('precipitation', precip_value)
+
+def create_co_gauge_horizontal(co_value, units='μg/m³'):
+    """Create horizontal gauge chart for CO concentration"""
+    if co_value == 'N/A' or co_value is None:
+        return create_empty_gauge_horizontal("🌫️ CO", "N/A")
+    return _render_gauge('co', co_value, units)
+
+EMPTY_GAUGES = {
+    'temperature': lambda: create_empty_gauge_horizontal("🌡️ Temperature", "N/A"),
+    'precipitation': lambda: create_empty_bar_horizontal("🌧️ Precipitation", "N/A"),
+    'co': lambda: create_empty_gauge_horizontal("🌫️ CO", "N/A")
+}
+
+@lru_cache(maxsize=64)
 def create_empty_gauge_horizontal(title, message):
     """Create empty horizontal gauge for unavailable data"""
     fig = go.Figure(go.Indicator(
@@ -125,8 +232,10 @@ def create_empty_gauge_horizontal(title, message):
         height=120,
         margin=dict(l=10, r=10, t=30, b=10)
     )
-    return fig
+    # Cached and shared between responses as a serialized figure
+    return json.loads(fig.to_json())
 
+@lru_cache(maxsize=64)
 def create_empty_bar_horizontal(title, message):
     """Create empty horizontal bar chart for unavailable data"""
     fig = go.Figure()
@@ -139,28 +248,72 @@ def create_empty_bar_horizontal(title, message):
         xaxis={'visible': False},
         yaxis={'visible': False}
     )
-    return fig
+    return json.loads(fig.to_json())
 
-def create_comparison_chart(region_name, historical_data):
-    """Create comparative chart with historical data"""
-    if region_name not in historical_data or not historical_data[region_name]:
-        return create_empty_comparison_chart()
-    
-    data = historical_data[region_name]
-    years = sorted(data.keys())
-    
+def comparison_points(series):
+    """Plotted (years, temperatures, precipitations, co_concentrations) of a series"""
     temperatures = []
     precipitations = []
     co_concentrations = []
     valid_years = []
     
-    for year in years:
-        if data[year]['temperature'] is not None:
-            temperatures.append(data[year]['temperature'])
-            precipitations.append(data[year]['precipitation'] if data[year]['precipitation'] is not None else 0)
-            co_concentrations.append(data[year]['co_concentration'] if data[year]['co_concentration'] is not None else 0)
+    for year in sorted(series.keys()):
+        if series[year]['temperature'] is not None:
+            temperatures.append(series[year]['temperature'])
+            precipitations.append(series[year]['precipitation'] if series[year]['precipitation'] is not None else 0)
+            co_concentrations.append(series[year]['co_concentration'] if series[year]['co_concentration'] is not None else 0)
             valid_years.append(year)
     
+    return valid_years, temperatures, precipitations, co_concentrations
+
+def update_comparison_chart(region_name, series, year, previous_state, co_units='μg/m³'):
+    """Return (figure update, chart state) after year was fetched
+
+    Only the point of the fetched year can have changed since the previous
+    call, so when the region and CO axis are unchanged that single point is
+    inserted into (or replaced in) each trace with a Patch. Anything else
+    falls back to a full create_comparison_chart. The figure update is a
+    full figure, a Patch, or no_update when nothing changed.
+    """
+    valid_years, temperatures, precipitations, co_concentrations = comparison_points(series)
+    has_co_data = any(co > 0 for co in co_concentrations)
+    state = {'region': region_name, 'years': valid_years, 'has_co': has_co_data, 'co_units': co_units}
+    
+    previous_years = (previous_state or {}).get('years', [])
+    incremental = (
+        previous_state is not None
+        and valid_years
+        and all(previous_state.get(key) == state[key] for key in ('region', 'has_co', 'co_units'))
+        and [y for y in valid_years if y != year] == [y for y in previous_years if y != year]
+        and (year in valid_years or year not in previous_years)
+    )
+    if not incremental:
+        return create_comparison_chart(region_name, series, co_units), state
+    
+    if year not in valid_years:
+        return no_update, state
+    
+    position = valid_years.index(year)
+    values = [temperatures[position], precipitations[position]]
+    if has_co_data:
+        values.append(co_concentrations[position])
+    
+    patch = Patch()
+    for trace, value in enumerate(values):
+        if year in previous_years:
+            patch['data'][trace]['y'][position] = value
+        else:
+            patch['data'][trace]['x'].insert(position, year)
+            patch['data'][trace]['y'].insert(position, value)
+    return patch, state
+
+def create_comparison_chart(region_name, series, co_units='μg/m³'):
+    """Create comparative chart from a region's {year: values} series"""
+    if not series:
+        return create_empty_comparison_chart()
+    
+    valid_years, temperatures, precipitations, co_concentrations = comparison_points(series)
+    
     if not valid_years:
         return create_empty_comparison_chart()
     
@@ -188,7 +341,7 @@ def create_comparison_chart(region_name, historical_data):
         fig.add_trace(go.Scatter(
             x=valid_years, y=co_concentrations,
             mode='lines+markers',
-            name='CO (μg/m³)',
+            name=f'CO ({co_units})',
             line=dict(color='#e67e22', width=3, dash='dot'),
             marker=dict(size=8, color='#e67e22'),
             yaxis='y2'
@@ -196,14 +349,14 @@ def create_comparison_chart(region_name, historical_data):
     
     layout_config = {
         'title': {
-            'text': f'📈 Data Evolution - {region_name} (2016-2024)',
+            'text': f'📈 Data Evolution - {region_name} ({FIRST_YEAR}-{LAST_YEAR})',
             'font': {'size': 14, 'color': 'white', 'family': 'Arial'},
             'x': 0.2
         },
         'xaxis': dict(
             title='Year',
             tickmode='linear',
-            tick0=2016,
+            tick0=FIRST_YEAR,
             dtick=1,
             color='white',
             gridcolor='#34495e',
@@ -233,7 +386,7 @@ def create_comparison_chart(region_name, historical_data):
     
     if has_co_data:
         layout_config['yaxis2'] = dict(
-            title='CO (μg/m³)',
+            title=f'CO ({co_units})',
             title_font=dict(color='#e67e22'),
             tickfont=dict(color='#e67e22'),
             overlaying='y',
@@ -244,6 +397,83 @@ def create_comparison_chart(region_name, historical_data):
     fig.update_layout(**layout_config)
     return fig
 
+def create_timeseries_chart(region_name, views, period_label):
+    """Create hourly time series chart from downsampled {parameter: (times, values)} views"""
+    if not views or all(len(values) == 0 for _, values in views.values()):
+        return create_empty_comparison_chart()
+    
+    fig = go.Figure()
+    
+    if 't_2m:C' in views:
+        times, values = views['t_2m:C']
+        fig.add_trace(go.Scattergl(
+            x=times, y=values,
+            mode='lines',
+            name='Temperature (°C)',
+            line=dict(color='#e74c3c', width=1.5),
+            yaxis='y'
+        ))
+    
+    if 'wind_speed_10m:ms' in views:
+        times, values = views['wind_speed_10m:ms']
+        fig.add_trace(go.Scattergl(
+            x=times, y=values,
+            mode='lines',
+            name='Wind (m/s)',
+            line=dict(color='#2ecc71', width=1),
+            yaxis='y'
+        ))
+    
+    if 'precip_1h:mm' in views:
+        times, values = views['precip_1h:mm']
+        fig.add_trace(go.Scattergl(
+            x=times, y=values,
+            mode='lines',
+            name='Precipitation (mm/h)',
+            line=dict(color='#3498db', width=1),
+            fill='tozeroy',
+            yaxis='y2'
+        ))
+    
+    fig.update_layout(
+        title={
+            'text': f'📈 Hourly Data - {region_name} ({period_label})',
+            'font': {'size': 14, 'color': 'white', 'family': 'Arial'},
+            'x': 0.2
+        },
+        xaxis=dict(color='white', gridcolor='#34495e'),
+        yaxis=dict(
+            title='Temperature (°C) / Wind (m/s)',
+            title_font=dict(color='#e74c3c'),
+            tickfont=dict(color='#e74c3c'),
+            gridcolor='#34495e',
+            zerolinecolor='#34495e'
+        ),
+        yaxis2=dict(
+            title='Precipitation (mm/h)',
+            title_font=dict(color='#3498db'),
+            tickfont=dict(color='#3498db'),
+            overlaying='y',
+            side='right',
+            rangemode='tozero',
+            showgrid=False
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color='white')
+        ),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        height=250,
+        margin=dict(l=50, r=50, t=60, b=50),
+        hovermode='x unified'
+    )
+    return fig
+
 def create_empty_comparison_chart():
     """Create empty comparative chart"""
     fig = go.Figure()
@@ -1,26 +1,21 @@
 # components/layout.py
+import uuid
 import dash_leaflet as dl
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from data.regions import REGIONS_DATA, REGION_DESCRIPTIONS
-from utils.helpers import make_modis_url
+from data.catalog import catalog, DEFAULT_REGION
+from utils.config import FIRST_YEAR, LAST_YEAR
+from utils.field_overlay import FIELDS
+from components.map_layers import build_layer_specs, create_tile_layers
 
 def create_layout():
-    """Create the main application layout"""
-    
-    # Initial MODIS layer
-    modis_layer = dl.TileLayer(
-        url=make_modis_url(2024),
-        attribution="NASA GIBS - MODIS",
-        id="modis-layer"
-    )
+    """Create the main application layout
 
-    # Contours layer
-    contours_layer = dl.TileLayer(
-        url="https://server.arcgisonline.com/ArcGIS/rest/services/Reference/World_Boundaries_and_Places/MapServer/tile/{z}/{y}/{x}",
-        attribution="Esri",
-        id="contours"
-    )
+    Called on every page load so each browser tab gets its own session id.
+    """
+    
+    # Initial layers, matching the default controls below
+    layer_specs, _ = build_layer_specs('with-borders', LAST_YEAR, ['modis', 'mopitt'])
 
     return html.Div([
         # Search bar in top right corner
@@ -30,11 +25,14 @@ def create_layout():
                     html.H5("🔍 Cities for Analysis", style={'color': 'white', 'marginBottom': '15px'}),
                     dcc.Dropdown(
                         id='region-search',
-                        options=[{'label': region, 'value': region} for region in REGIONS_DATA.keys()],
-                        value='Beijing China',
-                        placeholder="Select a city...",
+                        # Only the selected city is sent; typing searches the catalog on the server
+                        options=catalog.options([DEFAULT_REGION]),
+                        value=DEFAULT_REGION,
+                        placeholder="Type to search cities...",
                         style={'width': '220px', 'color': 'black'}
                     ),
+                    html.Div("🖱️ Or click the map to query any point",
+                             style={'color': '#95a5a6', 'fontSize': '10px', 'textAlign': 'center', 'marginTop': '6px'}),
                     html.Div(id='location-info', style={'color': 'white', 'fontSize': '11px', 'textAlign': 'center', 'marginTop': '10px'})
                 ])
             ], style={'backgroundColor': 'rgba(44, 62, 80, 0.95)', 'border': '1px solid #3498db', 'width': '270px'})
@@ -46,8 +44,8 @@ def create_layout():
                 dbc.CardBody([
                     html.H6("⚙️ Controls", style={'color': 'white', 'marginBottom': '15px'}),
                     html.Label("Year:", style={'color': 'white', 'fontSize': '12px'}),
-                    dcc.Slider(id="year", min=2016, max=2024, step=1, value=2024,
-                               marks={y: str(y) for y in range(2016, 2025, 2)},
+                    dcc.Slider(id="year", min=FIRST_YEAR, max=LAST_YEAR, step=1, value=LAST_YEAR,
+                               marks={y: str(y) for y in range(FIRST_YEAR, LAST_YEAR + 1, 2)},
                                tooltip={"placement": 'bottom', "always_visible": True}),
                     
                     html.Hr(style={'borderColor': '#3498db', 'margin': '10px 0'}),
@@ -84,9 +82,19 @@ def create_layout():
                     dcc.RadioItems(id='view-mode', options=[
                         {'label': ' 🛰️ Satellite', 'value': 'satellite-only'},
                         {'label': ' 📐 With borders', 'value': 'with-borders'}
-                    ], value='with-borders', style={'color': 'white', 'fontSize': '11px'})
+                    ], value='with-borders', style={'color': 'white', 'fontSize': '11px'}),
+                    
+                    html.Label("Field overlay:", style={'color': 'white', 'fontSize': '12px', 'marginTop': '8px'}),
+                    dcc.Dropdown(
+                        id='field-overlay',
+                        options=[{'label': 'None', 'value': 'none'}] +
+                                [{'label': spec['label'], 'value': field} for field, spec in FIELDS.items()],
+                        value='none',
+                        clearable=False,
+                        style={'color': 'black', 'fontSize': '11px'}
+                    )
                 ])
-            ], style={'backgroundColor': 'rgba(44, 62, 80, 0.95)', 'border': '1px solid #3498db', 'width': '280px', 'height': '380px'})
+            ], style={'backgroundColor': 'rgba(44, 62, 80, 0.95)', 'border': '1px solid #3498db', 'width': '280px', 'height': '450px'})
         ], style={'position': 'absolute', 'bottom': '20px', 'right': '20px', 'zIndex': 1000}),
 
         # Meteorological data on the left
@@ -94,7 +102,7 @@ def create_layout():
             dbc.Card([
                 dbc.CardBody([
                     html.Div([
-                        html.H5("📊 Meteorological Data (2016-2024)", 
+                        html.H5(f"📊 Meteorological Data ({FIRST_YEAR}-{LAST_YEAR})", 
                                style={'color': 'white', 'marginBottom': '15px', 'textAlign': 'center', 'display': 'inline-block'}),
                         dbc.Button(
                             "📈 Hide Chart", 
@@ -108,7 +116,11 @@ def create_layout():
                                 'borderColor': '#3498db',
                                 'fontSize': '10px'
                             }
-                        )
+                        ),
+                        html.Div(id='weather-status',
+                                 style={'color': '#3498db', 'fontSize': '10px', 'float': 'right', 'marginTop': '8px'}),
+                        html.Div(id='data-freshness',
+                                 style={'color': '#7f8c8d', 'fontSize': '10px', 'float': 'right', 'marginTop': '8px'})
                     ], style={'marginBottom': '15px'}),
                     
                     # 3 HORIZONTAL BOXES
@@ -148,7 +160,7 @@ def create_layout():
                                 ])
                             ], style={'backgroundColor': 'rgba(52, 152, 219, 0.1)', 'border': '1px solid #3498db', 'height': '130px'})
                         ], width=4)
-                    ])
+                    ], id='gauges-row', style={'transition': 'opacity 0.2s'})
                 ])
             ], style={'backgroundColor': 'rgba(44, 62, 80, 0.95)',
                       'border': '1px solid #3498db',
@@ -162,7 +174,15 @@ def create_layout():
             dbc.Card([
                 dbc.CardBody([
                     html.H5("📈 Comparative Chart", 
-                           style={'color': 'white', 'marginBottom': '15px', 'textAlign': 'center'}),
+                           style={'color': 'white', 'marginBottom': '5px', 'textAlign': 'center'}),
+                    
+                    dcc.RadioItems(id='chart-mode', options=[
+                        {'label': f' 📅 Yearly ({FIRST_YEAR}-{LAST_YEAR})', 'value': 'yearly'},
+                        {'label': ' ☀️ Hourly summer', 'value': 'season'},
+                        {'label': ' 🗓️ Hourly year', 'value': 'year'}
+                    ], value='yearly', inline=True,
+                       inputStyle={'marginLeft': '12px'},
+                       style={'color': 'white', 'fontSize': '11px', 'textAlign': 'center', 'marginBottom': '5px'}),
                     
                     dcc.Graph(
                         id='comparison-chart',
@@ -173,15 +193,22 @@ def create_layout():
             ], style={'backgroundColor': 'rgba(44, 62, 80, 0.95)',
                       'border': '1px solid #e67e22',
                       'width': '800px',
-                      'height': '320px'})
+                      'height': '345px'})
         ], style={'position': 'absolute', 'top': '240px', 'left': '20px', 'zIndex': 1000}, id='comparison-chart-container'),
 
         # Main map
-        dl.Map(center=[35.0, 105.0], zoom=3, children=[modis_layer, contours_layer],
+        dl.Map(center=[35.0, 105.0], zoom=3, children=create_tile_layers(layer_specs),
                style={"width": "100%", "height": "100vh"}, id="map"),
         
         # Storage components
-        dcc.Interval(id='animation-interval', interval=2000, n_intervals=0),
-        dcc.Store(id='animation-store', data={'is_playing': False, 'current_year': 2024}),
-        dcc.Store(id='chart-visibility-store', data={'chart_visible': True})
+        dcc.Interval(id='animation-interval', interval=2000, n_intervals=0, disabled=True),
+        dcc.Store(id='animation-store', data={'is_playing': False, 'current_year': LAST_YEAR,
+                                              'first_year': FIRST_YEAR, 'last_year': LAST_YEAR}),
+        dcc.Store(id='animation-bundle', data=None),
+        dcc.Store(id='chart-visibility-store', data={'chart_visible': True}),
+        dcc.Store(id='session-id', data=str(uuid.uuid4()), storage_type='session'),
+        dcc.Store(id='prefetch-store', data={'active': False}),
+        dcc.Store(id='map-layers-store', data=layer_specs),
+        dcc.Store(id='gauge-kinds-store', data=[None, None, None]),
+        dcc.Store(id='comparison-state-store', data=None)
     ], style={'backgroundColor': '#1a1a1a', 'margin': '0', 'padding': '0', 'height': '100vh', 'position': 'relative'})
\ No newline at end of file
@@ -0,0 +1,93 @@
+# components/map_layers.py
+import dash_leaflet as dl
+from dash import Patch, no_update
+from utils.config import TILE_PROXY_ENABLED
+from utils.helpers import make_modis_url, make_mopitt_url, make_borders_url, make_composite_url
+from utils.field_overlay import FIELDS, make_field_url
+
+def build_layer_specs(mode, year, instrument_combination, field=None, bounds=None):
+    """Describe the map layers as component props with stable ids
+
+    Returns (specs, instrument_names). The same layer keeps the same id
+    across years so only its url has to change. A gridded field overlay is
+    added as an ImageOverlay ('type': 'image') once the viewport is known.
+    """
+    specs = []
+    instrument_names = []
+
+    if TILE_PROXY_ENABLED and 'modis' in instrument_combination and 'mopitt' in instrument_combination:
+        # One server-side blended layer instead of two stacked ones
+        specs.append({
+            'id': 'composite-layer',
+            'url': make_composite_url(year),
+            'attribution': "NASA GIBS - MODIS Terra, MOPITT/Terra",
+            'maxNativeZoom': 9
+        })
+        instrument_names.extend(["MODIS", "MOPITT"])
+
+    elif 'modis' in instrument_combination:
+        specs.append({'id': 'modis-layer', 'url': make_modis_url(year), 'attribution': "NASA GIBS - MODIS Terra"})
+        instrument_names.append("MODIS")
+
+    if 'mopitt' in instrument_combination and "MOPITT" not in instrument_names:
+        specs.append({
+            'id': 'mopitt-layer',
+            'url': make_mopitt_url(year),
+            'attribution': "NASA GIBS - MOPITT/Terra",
+            'opacity': 0.6
+        })
+        instrument_names.append("MOPITT")
+
+    if not specs:
+        specs.append({'id': 'modis-layer', 'url': make_modis_url(year), 'attribution': "NASA GIBS - MODIS Terra"})
+        instrument_names.append("MODIS")
+
+    if field in FIELDS and bounds:
+        url, overlay_bounds = make_field_url(field, year, bounds)
+        specs.append({
+            'id': 'field-layer',
+            'type': 'image',
+            'url': url,
+            'bounds': overlay_bounds,
+            'opacity': 0.7,
+            'attribution': "Meteomatics"
+        })
+
+    if mode == 'with-borders':
+        specs.append({'id': 'contours', 'url': make_borders_url(), 'attribution': "Esri"})
+
+    return specs, instrument_names
+
+LAYER_COMPONENTS = {
+    'tile': dl.TileLayer,
+    'image': dl.ImageOverlay
+}
+
+def create_tile_layers(specs):
+    """Build the map layer children for a list of layer specs"""
+    layers = []
+    for spec in specs:
+        props = dict(spec)
+        layers.append(LAYER_COMPONENTS[props.pop('type', 'tile')](**props))
+    return layers
+
+def update_tile_layers(previous_specs, specs):
+    """Return the smallest map.children update that turns previous_specs into specs
+
+    When the layer ids are unchanged only the props that differ are sent as
+    a Patch, so Leaflet keeps the existing layers (and their loaded tiles).
+    Otherwise the children are rebuilt.
+    """
+    previous_ids = [spec['id'] for spec in previous_specs or []]
+    if previous_ids != [spec['id'] for spec in specs]:
+        return create_tile_layers(specs)
+
+    patch = Patch()
+    changed = False
+    for index, (previous, spec) in enumerate(zip(previous_specs, specs)):
+        for prop, value in spec.items():
+            if prop != 'type' and previous.get(prop) != value:
+                patch[index]['props'][prop] = value
+                changed = True
+
+    return patch if changed else no_update
@@ -0,0 +1,293 @@
+# data/catalog.py
+import bisect
+import csv
+import logging
+import os
+
+import numpy as np
+
+from data.regions import REGIONS_DATA, REGION_DESCRIPTIONS
+from utils.config import GAZETTEER_PATH, CATALOG_CELL_DEGREES, SEARCH_MAX_OPTIONS, POINT_NEAREST_MAX_KM
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = 'Beijing China'
+POINT_PREFIX = 'Point '
+DEFAULT_ZOOM = 6
+EARTH_RADIUS_KM = 6371.0
+# Gazetteer rows of the same name closer than this are one place listed twice
+DUPLICATE_MAX_KM = 25.0
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class LocationCatalog:
+    """Array-backed catalog of named locations
+
+    Coordinates, zooms and populations live in NumPy arrays indexed by row.
+    Two indexes sit on top of them:
+
+    - a sorted list of lower-cased names for prefix search by bisection
+    - a lat/lon grid of cell_degrees cells stored CSR-style (rows sorted
+      by cell, plus the start offset of every occupied cell) for nearest
+      and radius queries
+
+    Both only look at the rows that can match, so lookups stay flat as
+    the catalog grows.
+    """
+
+    def __init__(self, names, lats, lons, zooms=None, populations=None, descriptions=None,
+                 cell_degrees=1.0):
+        self.names = list(names)
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        count = len(self.names)
+        self.zoom = np.asarray(zooms if zooms is not None else [DEFAULT_ZOOM] * count, dtype=np.int8)
+        self.population = np.asarray(populations if populations is not None else [0] * count, dtype=np.int64)
+        self.descriptions = dict(descriptions or {})
+        self.cell_degrees = cell_degrees
+        self._rows = {name: row for row, name in enumerate(self.names)}
+
+        # Prefix index
+        self._search_order = sorted(range(count), key=lambda row: self.names[row].lower())
+        self._search_keys = [self.names[row].lower() for row in self._search_order]
+
+        # Grid index
+        self._columns = int(np.ceil(360.0 / cell_degrees))
+        cells = self._cell(self.lat, self.lon)
+        self._cell_order = np.argsort(cells, kind='stable')
+        self._cell_ids, self._cell_starts = np.unique(cells[self._cell_order], return_index=True)
+        self._cell_ends = np.append(self._cell_starts[1:], count)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def _cell(self, lat, lon):
+        row = np.floor((np.asarray(lat) + 90.0) / self.cell_degrees).astype(np.int64)
+        column = np.floor((np.asarray(lon) + 180.0) / self.cell_degrees).astype(np.int64) % self._columns
+        return row * self._columns + column
+
+    def get(self, name):
+        """Region dict (lat, lon, zoom, description) of a name, or None"""
+        row = self._rows.get(name)
+        if row is None:
+            return None
+        return {
+            'lat': float(self.lat[row]),
+            'lon': float(self.lon[row]),
+            'zoom': int(self.zoom[row]),
+            'description': self.descriptions.get(name, '')
+        }
+
+    def search(self, prefix, limit=SEARCH_MAX_OPTIONS):
+        """Names starting with prefix (case-insensitive), most populous first"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._search_keys, prefix)
+        end = bisect.bisect_left(self._search_keys, prefix + '\U0010ffff', start)
+        if start == end:
+            return []
+
+        rows = np.asarray(self._search_order[start:end])
+        if len(rows) > limit:
+            # Partial sort: only the top `limit` candidates are ordered
+            top = np.argpartition(-self.population[rows], limit - 1)[:limit]
+            rows = rows[top]
+        rows = rows[np.lexsort((rows, -self.population[rows]))]
+        return [self.names[row] for row in rows]
+
+    def _rows_in_cells(self, cell_ids):
+        cell_ids = np.asarray(cell_ids, dtype=np.int64)
+        positions = np.searchsorted(self._cell_ids, cell_ids)
+        found = positions < len(self._cell_ids)
+        found[found] = self._cell_ids[positions[found]] == cell_ids[found]
+        positions = positions[found]
+        if len(positions) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._cell_order[self._cell_starts[p]:self._cell_ends[p]] for p in positions])
+
+    def _cells_around(self, lat, lon, radius, shell=False):
+        """Cell ids at most (or, with shell, exactly) `radius` cells from the cell of (lat, lon)"""
+        rows_total = int(np.ceil(180.0 / self.cell_degrees))
+        center_row = int((lat + 90.0) // self.cell_degrees)
+        center_column = int((lon + 180.0) // self.cell_degrees)
+        ids = set()
+        for row in range(max(center_row - radius, 0), min(center_row + radius, rows_total - 1) + 1):
+            if shell and abs(row - center_row) != radius:
+                columns = (center_column - radius, center_column + radius)
+            else:
+                columns = range(center_column - radius, center_column + radius + 1)
+            for column in columns:
+                ids.add(row * self._columns + column % self._columns)
+        return sorted(ids)
+
+    def _km_per_cell(self, lat, radius):
+        # Longitude cells shrink towards the poles; use the narrowest one reached
+        lat = min(abs(lat) + radius * self.cell_degrees, 89.0)
+        return self.cell_degrees * 111.0 * max(np.cos(np.radians(lat)), 0.01)
+
+    def within(self, lat, lon, radius_km):
+        """Names within radius_km of a point, nearest first"""
+        radius = 0
+        while radius * self._km_per_cell(lat, radius) < radius_km and radius < self._columns // 2:
+            radius += 1
+        rows = self._rows_in_cells(self._cells_around(lat, lon, radius))
+        if len(rows) == 0:
+            return []
+        distances = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        return [self.names[row] for row in rows[np.argsort(distances, kind='stable')]]
+
+    def nearest(self, lat, lon, max_km=None):
+        """(name, distance_km) of the closest location, or (None, None)
+
+        Shells of cells are searched outwards until the best match is closer
+        than anything beyond the shells searched so far could be.
+        """
+        best_row, best_distance = None, np.inf
+        for radius in range(self._columns // 2 + 1):
+            rows = self._rows_in_cells(self._cells_around(lat, lon, radius, shell=True))
+            if len(rows):
+                distances = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+                index = int(np.argmin(distances))
+                if distances[index] < best_distance:
+                    best_row, best_distance = int(rows[index]), float(distances[index])
+
+            searched_km = radius * self._km_per_cell(lat, radius)
+            if best_distance <= searched_km or (max_km is not None and searched_km > max_km):
+                break
+
+        if best_row is None or (max_km is not None and best_distance > max_km):
+            return None, None
+        return self.names[best_row], best_distance
+
+    def options(self, names):
+        """Dropdown options for a list of names"""
+        return [{'label': name, 'value': name} for name in names]
+
+
+def read_gazetteer(path):
+    """Rows of a gazetteer CSV with name, country, lat, lon and optional population and admin1 columns"""
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        for record in csv.DictReader(csv_file):
+            try:
+                lat, lon = float(record['lat']), float(record['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            name = ' '.join(part for part in (record.get('name', '').strip(), record.get('country', '').strip()) if part)
+            if not name:
+                continue
+            population = record.get('population') or 0
+            try:
+                population = int(float(population))
+            except ValueError:
+                population = 0
+            yield name, lat, lon, population, record.get('country', '').strip(), (record.get('admin1') or '').strip()
+
+
+def unique_name(name, lat, lon, admin, taken):
+    """A name for a second place called name: qualified by admin1 region, else by coordinates"""
+    if admin and f"{name} ({admin})" not in taken:
+        name = f"{name} ({admin})"
+    else:
+        name = f"{name} ({lat:.2f}, {lon:.2f})"
+    taken[name] = [(lat, lon)]
+    return name
+
+
+def load_catalog(path=GAZETTEER_PATH, cell_degrees=CATALOG_CELL_DEGREES):
+    """The curated REGIONS_DATA cities plus every row of the gazetteer CSV, if any
+
+    A gazetteer name already taken by a different place is qualified with
+    its admin1 region, e.g. 'Springfield United States (Illinois)', or with
+    its coordinates when that is taken too. Rows repeating a place within
+    DUPLICATE_MAX_KM under the same name are skipped.
+    """
+    names, lats, lons, zooms, populations = [], [], [], [], []
+    descriptions = dict(REGION_DESCRIPTIONS)
+
+    for name, region in REGIONS_DATA.items():
+        names.append(name)
+        lats.append(region['lat'])
+        lons.append(region['lon'])
+        zooms.append(region['zoom'])
+        # Curated cities rank first in search results
+        populations.append(np.iinfo(np.int64).max)
+
+    if path and os.path.exists(path):
+        seen = {name: [(lat, lon)] for name, lat, lon in zip(names, lats, lons)}
+        for name, lat, lon, population, country, admin in read_gazetteer(path):
+            places = seen.get(name, [])
+            if places and min(haversine_km(lat, lon, *np.array(places).T)) <= DUPLICATE_MAX_KM:
+                continue
+            places.append((lat, lon))
+            seen[name] = places
+            if len(places) > 1:
+                name = unique_name(name, lat, lon, admin, seen)
+            names.append(name)
+            lats.append(lat)
+            lons.append(lon)
+            zooms.append(DEFAULT_ZOOM)
+            populations.append(population)
+        logger.info("Loaded %d locations from %s", len(names), path)
+    elif path:
+        logger.warning("Gazetteer %s not found, using the built-in cities only", path)
+
+    return LocationCatalog(names, lats, lons, zooms, populations, descriptions, cell_degrees)
+
+
+catalog = load_catalog()
+
+
+def point_region_name(lat, lon):
+    """Region name of an arbitrary point, e.g. 'Point 39.7500, 116.5000'"""
+    return f"{POINT_PREFIX}{lat:.4f}, {lon:.4f}"
+
+
+def parse_point_name(name):
+    """(lat, lon) of a point region name, or None for anything else"""
+    if not name or not name.startswith(POINT_PREFIX):
+        return None
+    try:
+        lat, lon = (float(part) for part in name[len(POINT_PREFIX):].split(','))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def resolve_region(name):
+    """Region dict of a catalog name or point name, or None
+
+    Point regions have no preferred zoom and are described by the nearest
+    catalog location.
+    """
+    point = parse_point_name(name)
+    if point is None:
+        return catalog.get(name) if name else None
+
+    lat, lon = point
+    nearest, distance = catalog.nearest(lat, lon, POINT_NEAREST_MAX_KM)
+    return {
+        'lat': lat,
+        'lon': lon,
+        'zoom': None,
+        'description': f"near {nearest} ({distance:.0f} km)" if nearest else "Custom point"
+    }
+
+
+def get_region(name):
+    """Region dict of a catalog or point name, falling back to the default city"""
+    return resolve_region(name) or catalog.get(DEFAULT_REGION)
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+# Usage: gunicorn -c gunicorn.conf.py wsgi:server
+import subprocess
+import sys
+
+from utils.config import HOST, PORT, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT, WARMUP_ON_START
+
+bind = f"{HOST}:{PORT}"
+workers = WEB_WORKERS
+worker_class = 'gthread'
+threads = WEB_THREADS
+timeout = WEB_TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so long-lived processes don't accumulate memory
+max_requests = 2000
+max_requests_jitter = 200
+
+
+def on_starting(server):
+    # Warm the shared on-disk caches before any worker is forked. It runs in a
+    # child process so the master never opens SQLite connections or threads
+    # that the forked workers would inherit.
+    if WARMUP_ON_START:
+        server.log.info("Warming data and tile caches")
+        subprocess.run([sys.executable, '-m', 'utils.warmup'], check=False)
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Keep caches, locks and shared resilience state of the tests out of the real CACHE_DIR
+os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='nassa-tests-')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
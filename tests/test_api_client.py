@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+from meteomatics.exceptions import API_EXCEPTIONS
+
+import utils.api_client as api_client
+import utils.resilience as resilience
+from utils.config import METEOMATICS_RETRIES, METEOMATICS_TIMEOUT_SECONDS
+from utils.resilience import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+class FailingApi:
+    """meteomatics.api stand-in whose queries fail with the exception of an HTTP status"""
+
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def query_time_series(self, *args, **kwargs):
+        self.calls += 1
+        raise API_EXCEPTIONS[self.status](f"HTTP {self.status}")
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def make(status, failure_threshold=2):
+        api = FailingApi(status)
+        monkeypatch.setattr(api_client, 'meteomatics_api', lambda: api)
+        monkeypatch.setattr(api_client, 'rate_limiter', TokenBucket(1e6, 1e6))
+        monkeypatch.setattr(api_client, 'circuit_breaker', CircuitBreaker(failure_threshold, 60))
+        monkeypatch.setattr(resilience.time, 'sleep', lambda seconds: None)
+        return api
+    return make
+
+
+def query(startdate=datetime(2020, 6, 15, 12)):
+    return api_client.query_points([(39.9, 116.4)], startdate, startdate, ['t_2m:C'])
+
+
+def test_service_unavailable_is_retried_and_opens_the_breaker(upstream):
+    api = upstream(503)
+
+    for _ in range(2):
+        with pytest.raises(API_EXCEPTIONS[503]):
+            query()
+    assert api.calls == 2 * (METEOMATICS_RETRIES + 1)
+    assert api_client.circuit_breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        query()
+    assert api.calls == 2 * (METEOMATICS_RETRIES + 1)
+
+
+@pytest.mark.parametrize('status', [502, 504])
+def test_gateway_errors_are_transient(upstream, status):
+    api = upstream(status, failure_threshold=1)
+
+    with pytest.raises(API_EXCEPTIONS[status]):
+        query()
+    assert api.calls == METEOMATICS_RETRIES + 1
+    assert api_client.circuit_breaker.state == 'open'
+
+
+@pytest.mark.parametrize('status', [400, 401])
+def test_client_errors_are_not_retried_and_keep_the_breaker_closed(upstream, status):
+    api = upstream(status, failure_threshold=1)
+
+    with pytest.raises(API_EXCEPTIONS[status]):
+        query()
+    assert api.calls == 1
+    assert api_client.circuit_breaker.state == 'closed'
+
+
+def test_requests_use_the_configured_timeout(monkeypatch):
+    import meteomatics.api
+
+    seen = {}
+
+    def get_request(url, timeout=None, **kwargs):
+        seen['timeout'] = timeout
+        raise TimeoutError("stop here")
+
+    monkeypatch.setattr(meteomatics.api, 'query_api', meteomatics.api.query_api)
+    monkeypatch.setattr(meteomatics.api, 'get_request', get_request)
+    api = api_client.meteomatics_api()
+    with pytest.raises(TimeoutError):
+        api.query_time_series([(39.9, 116.4)], datetime(2020, 6, 15, 12), datetime(2020, 6, 15, 13),
+                              timedelta(hours=1), ['t_2m:C'], 'user', 'password')
+    assert seen['timeout'] == METEOMATICS_TIMEOUT_SECONDS
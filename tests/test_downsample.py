@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from utils.downsample import lttb, minmax_decimate
+
+
+@pytest.fixture
+def series():
+    x = np.arange(100)
+    y = np.sin(x / 5.0)
+    y[37] = 5.0
+    return x, y
+
+
+@pytest.mark.parametrize('downsample', [lttb, minmax_decimate])
+@pytest.mark.parametrize('n_out', [0, 1, 2, 3, 10, 99])
+def test_at_most_n_out_points(series, downsample, n_out):
+    x, y = downsample(*series, n_out)
+    assert len(x) == len(y) <= n_out
+
+
+def test_minmax_keeps_the_peak_of_a_single_point(series):
+    x, y = minmax_decimate(*series, 1)
+    assert x.tolist() == [37] and y.tolist() == [5.0]
+
+
+def test_short_series_are_returned_whole(series):
+    x, y = minmax_decimate(series[0][:5], series[1][:5], 10)
+    assert x.tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,43 @@
+import os
+import sqlite3
+
+from utils.metrics import Counter, Histogram, MetricStore
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT metric, labels, field, value FROM metric_values ORDER BY field').fetchall()
+
+
+def test_updates_are_summed_in_memory_until_flushed(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite')
+    store = MetricStore(path, flush_interval=3600)
+    requests = Counter('test_requests_total', 'Requests', ['outcome'], enabled=True, store=store)
+
+    for _ in range(3):
+        requests.inc(outcome='ok')
+    assert not os.path.exists(path)
+
+    store.flush()
+    assert rows(path) == [('test_requests_total', '["ok"]', '', 3.0)]
+
+
+def test_reads_include_pending_updates(tmp_path):
+    store = MetricStore(str(tmp_path / 'metrics.sqlite'), flush_interval=3600)
+    latency = Histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0), enabled=True, store=store)
+
+    latency.observe(0.05)
+    latency.observe(0.5)
+    assert store.read('test_latency_seconds') == {(): {'0': 1, '1': 1, 'sum': 0.55, 'count': 2}}
+
+
+def test_failed_flushes_keep_the_updates(tmp_path):
+    blocked = tmp_path / 'blocked'
+    blocked.write_text('not a directory')
+    store = MetricStore(str(blocked / 'metrics.sqlite'), flush_interval=3600)
+    store.add([('test_total', (), '', 2)])
+
+    store.flush()
+    store.path = str(tmp_path / 'metrics.sqlite')
+    store.flush()
+    assert rows(store.path) == [('test_total', '[]', '', 2.0)]
@@ -0,0 +1,47 @@
+import pytest
+
+import utils.resilience as resilience
+from utils.resilience import retry_with_backoff
+
+
+class Clock:
+    """time.monotonic and time.sleep stand-in where every call takes call_seconds"""
+
+    def __init__(self, call_seconds):
+        self.now = 0.0
+        self.call_seconds = call_seconds
+        self.calls = 0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def call(self):
+        self.calls += 1
+        self.now += self.call_seconds
+        raise TimeoutError("read timed out")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(call_seconds=15)
+    monkeypatch.setattr(resilience.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(resilience.time, 'sleep', clock.sleep)
+    monkeypatch.setattr(resilience.random, 'uniform', lambda low, high: high)
+    return clock
+
+
+def test_retries_stop_before_the_deadline(clock):
+    with pytest.raises(TimeoutError):
+        retry_with_backoff(clock.call, retries=3, deadline=40, attempt_seconds=15)
+    # A third attempt would start at 31.5 s and could run to 46.5 s
+    assert clock.calls == 2
+    assert clock.now <= 40
+
+
+def test_retries_without_a_deadline_use_every_attempt(clock):
+    with pytest.raises(TimeoutError):
+        retry_with_backoff(clock.call, retries=3)
+    assert clock.calls == 4
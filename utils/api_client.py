@@ -1,58 +1,422 @@
 # utils/api_client.py
-import meteomatics.api as api
-from datetime import datetime, timedelta
-from utils.config import METEOMATICS_USERNAME, METEOMATICS_PASSWORD
+import functools
+import logging
+from datetime import datetime, timedelta, timezone
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import (
+    METEOMATICS_USERNAME, METEOMATICS_PASSWORD, CACHE_DIR, CURRENT_DATA_MAX_AGE_MINUTES,
+    METEOMATICS_RATE_PER_SECOND, METEOMATICS_BURST, METEOMATICS_RATE_WAIT_SECONDS,
+    METEOMATICS_RETRIES, METEOMATICS_BREAKER_FAILURES, METEOMATICS_BREAKER_RESET_SECONDS,
+    METEOMATICS_TIMEOUT_SECONDS, METEOMATICS_DEADLINE_SECONDS
+)
+from utils.cache import response_cache, make_cache_key, expiry_for_year
+from utils.metrics import UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from utils.singleflight import SingleFlight
+from utils.timeseries_store import TimeSeriesStore
+from utils.resilience import (
+    TokenBucket, CircuitBreaker, FileState, CircuitOpenError, RateLimitExceeded,
+    retry_with_backoff, is_transient_error, is_client_error
+)
+
+logger = logging.getLogger(__name__)
+
+MODEL = 'mix'
+
+BASE_PARAMETERS = [
+    't_2m:C',           # Temperature at 2m in Celsius
+    'precip_1h:mm',     # Precipitation in last hour
+    'wind_speed_10m:ms' # Wind speed at 10m
+]
+
+CO_PARAMETERS = ['co:ugm3']
+
+# Concurrent identical point queries share one upstream request
+request_flight = SingleFlight(os.path.join(CACHE_DIR, 'locks'))
+
+# Background refreshes of current-year data (stale-while-revalidate)
+refresh_executor = ThreadPoolExecutor(2, thread_name_prefix='refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# Forked children (background callback jobs) have no executor threads and are
+# killed once their result is read, so they refresh inline instead
+_in_forked_child = False
+
+def _mark_forked_child():
+    global _in_forked_child
+    _in_forked_child = True
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_mark_forked_child)
+
+# Stay within the Meteomatics plan and stop calling it while it is failing.
+# Both are shared by every worker, job and offline tool using CACHE_DIR.
+rate_limiter = TokenBucket(
+    METEOMATICS_RATE_PER_SECOND, METEOMATICS_BURST,
+    FileState(os.path.join(CACHE_DIR, 'resilience', 'rate_limit.json')))
+circuit_breaker = CircuitBreaker(
+    METEOMATICS_BREAKER_FAILURES, METEOMATICS_BREAKER_RESET_SECONDS,
+    FileState(os.path.join(CACHE_DIR, 'resilience', 'circuit_breaker.json')))
+
+timeseries_store = TimeSeriesStore(os.path.join(CACHE_DIR, 'timeseries'))
+
+TIMESERIES_PERIODS = {
+    'season': ((6, 1), (9, 1)),   # June to August
+    'year': ((1, 1), None)        # Whole calendar year
+}
+
+def build_parameters(include_co=False):
+    """Return the parameter list requested for a point query"""
+    return BASE_PARAMETERS + (CO_PARAMETERS if include_co else [])
+
+def utc_hour():
+    """The current UTC hour as a naive datetime, like the fixed windows of past years"""
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+def time_window(year):
+    """Return the (startdate, enddate) hour queried for a given year"""
+    if year == datetime.now(timezone.utc).year:
+        startdate = utc_hour()
+    else:
+        startdate = datetime(year, 6, 15, 12, 0, 0)
+    return startdate, startdate + timedelta(hours=1)
+
+def timeseries_window(year, period='season'):
+    """Return the (startdate, enddate) range of an hourly time series view
+
+    Ranges of the current year stop at the current hour.
+    """
+    (start_month, start_day), end = TIMESERIES_PERIODS[period]
+    startdate = datetime(year, start_month, start_day)
+    enddate = datetime(year, *end) if end else datetime(year + 1, 1, 1)
+    return startdate, min(enddate, utc_hour())
+
+def parse_row(row, parameters, startdate):
+    """Convert one DataFrame row into the dict returned by the client"""
+    parsed_data = {'valid_time': startdate.isoformat()}
+    for param in parameters:
+        if param in row.index:
+            value = row[param]
+            parsed_data[param] = float(value) if value == value else 'N/A'
+        else:
+            parsed_data[param] = 'N/A'
+
+    parsed_data['co_available'] = 'co:ugm3' in parameters
+    return parsed_data
+
+def get_cache_stats():
+    """Hit/miss counters of the response cache"""
+    return response_cache.stats()
+
+def with_request_timeout(query_api, timeout_seconds):
+    """query_api defaulting to timeout_seconds instead of the library's 330 s"""
+    @functools.wraps(query_api)
+    def bounded(*args, **kwargs):
+        kwargs.setdefault('timeout_seconds', timeout_seconds)
+        return query_api(*args, **kwargs)
+    bounded.timeout_seconds = timeout_seconds
+    return bounded
+
+def meteomatics_api():
+    """The meteomatics.api module, imported on first use since it pulls in pandas
+
+    Its query functions do not pass a request timeout through, so the
+    query_api they all call is wrapped once to use METEOMATICS_TIMEOUT_SECONDS.
+    """
+    import meteomatics.api as api
+    if not hasattr(api.query_api, 'timeout_seconds'):
+        api.query_api = with_request_timeout(api.query_api, METEOMATICS_TIMEOUT_SECONDS)
+    return api
+
+def call_upstream(query):
+    """Run one Meteomatics query under the shared rate limit and circuit breaker
+
+    Requests are rate limited, transient errors are retried with jittered
+    exponential backoff within METEOMATICS_DEADLINE_SECONDS, and
+    CircuitOpenError is raised without calling upstream while the circuit
+    breaker is open.
+    """
+    if not circuit_breaker.allow():
+        UPSTREAM_REQUESTS.inc(outcome='circuit_open')
+        raise CircuitOpenError("Meteomatics circuit breaker is open")
+
+    def attempt():
+        if not rate_limiter.acquire(METEOMATICS_RATE_WAIT_SECONDS):
+            UPSTREAM_REQUESTS.inc(outcome='rate_limited')
+            raise RateLimitExceeded("No Meteomatics request token available")
+
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            df = query()
+            outcome = 'ok'
+            return df
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
+            UPSTREAM_REQUESTS.inc(outcome=outcome)
 
-def get_meteomatics_data(lat, lon, year, include_co=False):
-    """Get meteorological data from Meteomatics API"""
     try:
-        coordinates = [(lat, lon)]
-        
-        base_parameters = [
-            't_2m:C',           # Temperature at 2m in Celsius
-            'precip_1h:mm',     # Precipitation in last hour
-            'wind_speed_10m:ms' # Wind speed at 10m
-        ]
-        
-        co_parameters = ['co:ugm3'] if include_co else []
-        
-        model = 'mix'
-        current_year = datetime.now().year
-        
-        if year == current_year:
-            startdate = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-            enddate = startdate + timedelta(hours=1)
-            parameters = base_parameters + co_parameters
+        # An attempt can wait for a token and then for the request timeout
+        df = retry_with_backoff(
+            attempt, retries=METEOMATICS_RETRIES, deadline=METEOMATICS_DEADLINE_SECONDS,
+            attempt_seconds=METEOMATICS_RATE_WAIT_SECONDS + METEOMATICS_TIMEOUT_SECONDS)
+    except RateLimitExceeded:
+        # Local back-pressure says nothing about upstream health
+        circuit_breaker.record_success()
+        raise
+    except Exception as e:
+        if is_transient_error(e):
+            circuit_breaker.record_failure()
+        elif is_client_error(e):
+            # Upstream answered (e.g. bad request), so it is reachable
+            circuit_breaker.record_success()
+        raise
+
+    circuit_breaker.record_success()
+    return df
+
+def query_points(coordinates, startdate, enddate, parameters):
+    """Run one time series query for a list of coordinates"""
+    interval = timedelta(hours=1)
+    return call_upstream(lambda: meteomatics_api().query_time_series(
+        coordinates, startdate, enddate, interval, parameters,
+        METEOMATICS_USERNAME, METEOMATICS_PASSWORD, model=MODEL))
+
+def query_grid(parameter, startdate, south, west, north, east, resolution):
+    """Run one grid query: a DataFrame indexed by latitude with one column per longitude"""
+    return call_upstream(lambda: meteomatics_api().query_grid(
+        startdate, parameter, north, west, south, east, resolution, resolution,
+        METEOMATICS_USERNAME, METEOMATICS_PASSWORD, model=MODEL))
+
+def get_stale(cache_key):
+    """Last good cached value for a key, marked as stale, or None"""
+    stale = response_cache.get_stale(cache_key)
+    if stale is not None:
+        logger.warning("Serving stale cached Meteomatics data")
+        stale['stale'] = True
+    return stale
+
+# Largest difference (degrees) between a requested coordinate and the one echoed back
+COORDINATE_TOLERANCE = 1e-3
+
+def split_by_coordinate(df, coordinates):
+    """Map every requested coordinate to its first row in a time series DataFrame
+
+    Coordinates without a row within COORDINATE_TOLERANCE are left out, so a
+    point dropped by upstream is treated as missing rather than given the
+    row of another location.
+    """
+    if 'lat' not in df.index.names:
+        # Single coordinate responses are indexed by validdate only
+        return {coordinates[0]: df.iloc[0]} if len(coordinates) == 1 else {}
+
+    lats = df.index.get_level_values('lat')
+    lons = df.index.get_level_values('lon')
+    rows = {}
+    for lat, lon in coordinates:
+        # The API echoes rounded coordinates, so match on the nearest one
+        distance = abs(lats - lat) + abs(lons - lon)
+        index = int(distance.argmin())
+        if abs(lats[index] - lat) <= COORDINATE_TOLERANCE and abs(lons[index] - lon) <= COORDINATE_TOLERANCE:
+            rows[(lat, lon)] = df.iloc[index]
         else:
-            startdate = datetime(year, 6, 15, 12, 0, 0)
-            enddate = startdate + timedelta(hours=1)
-            parameters = base_parameters + co_parameters
-        
-        interval = timedelta(hours=1)
-
-        print(f"Getting Meteomatics data for ({lat}, {lon}) in year {year}")
-        print(f"Include CO: {include_co}")
-        
-        df = api.query_time_series(coordinates, startdate, enddate, interval, 
-                                 parameters, METEOMATICS_USERNAME, METEOMATICS_PASSWORD, 
-                                 model=model)
-        
+            logger.warning("No row returned for (%s, %s)", lat, lon)
+    return rows
+
+def is_fresh(entry, max_age=None):
+    """Whether a (value, expires_at, fetched_at) cache entry can be served as is"""
+    _, expires_at, fetched_at = entry
+    now = time.time()
+    return (expires_at is None or expires_at > now) and (max_age is None or now - fetched_at <= max_age)
+
+def with_freshness(value, fetched_at):
+    """Attach the time the value was fetched from upstream"""
+    value['fetched_at'] = fetched_at
+    return value
+
+def _fetch_point(lat, lon, year, parameters, cache_key, max_age=None):
+    # Another worker may have refreshed the cache while we waited for the lock
+    entry = response_cache.get_entry(cache_key, max_age, record=False)
+    if entry is not None and is_fresh(entry, max_age):
+        return with_freshness(entry[0], entry[2])
+
+    try:
+        startdate, enddate = time_window(year)
+
+        logger.info("Getting Meteomatics data for (%s, %s) in year %s", lat, lon, year)
+        logger.debug("Parameters: %s", parameters)
+
+        df = query_points([(lat, lon)], startdate, enddate, parameters)
+
         if not df.empty:
-            first_row = df.iloc[0]
-            parsed_data = {}
-            
+            parsed_data = parse_row(df.iloc[0], parameters, startdate)
+            response_cache.set(cache_key, parsed_data, expiry_for_year(year))
+            return with_freshness(parsed_data, time.time())
+        else:
+            logger.warning("No data returned by Meteomatics API")
+            return get_stale(cache_key)
+
+    except Exception as e:
+        logger.error("Error accessing Meteomatics API: %s", e)
+        return get_stale(cache_key)
+
+def schedule_refresh(lat, lon, year, parameters, cache_key, max_age):
+    """Refresh a cache entry in the background, at most once at a time per key"""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+
+    def refresh():
+        try:
+            request_flight.do(cache_key, lambda: _fetch_point(lat, lon, year, parameters, cache_key, max_age))
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    refresh_executor.submit(refresh)
+
+def get_meteomatics_data(lat, lon, year, include_co=False):
+    """Get meteorological data from Meteomatics API
+
+    Current-year data is served stale-while-revalidate: the latest cached
+    observation is returned at once and refreshed in the background once it
+    has expired or is older than CURRENT_DATA_MAX_AGE_MINUTES. Inside a
+    background callback job the refresh runs before returning, since the
+    job process does not outlive its result. Results carry 'valid_time'
+    and 'fetched_at' so the UI can tell how fresh they are.
+    """
+    parameters = build_parameters(include_co)
+    cache_key = make_cache_key(lat, lon, year, parameters, MODEL)
+    max_age = CURRENT_DATA_MAX_AGE_MINUTES * 60 if year >= datetime.now(timezone.utc).year else None
+
+    entry = response_cache.get_entry(cache_key, max_age)
+    if entry is not None:
+        if is_fresh(entry, max_age):
+            return with_freshness(entry[0], entry[2])
+        if not _in_forked_child:
+            schedule_refresh(lat, lon, year, parameters, cache_key, max_age)
+            return with_freshness(entry[0], entry[2])
+
+    parsed_data = request_flight.do(
+        cache_key, lambda: _fetch_point(lat, lon, year, parameters, cache_key, max_age)
+    )
+    return dict(parsed_data) if parsed_data is not None else None
+
+def get_cached_meteomatics_data(lat, lon, year, include_co=False):
+    """Cached, unexpired data for a point, or None; never goes upstream"""
+    parameters = build_parameters(include_co)
+    return response_cache.get(make_cache_key(lat, lon, year, parameters, MODEL))
+
+def get_meteomatics_data_batch(points, include_co=False, parameters=None):
+    """Get data for many (lat, lon, year) points in as few requests as possible
+
+    Cached points are answered locally; the rest are grouped by time window
+    and each group is sent as a single multi-coordinate query. Returns a
+    dict mapping every (lat, lon, year) to its parsed data, or None when it
+    could not be fetched. parameters overrides the list built from include_co.
+    """
+    parameters = parameters or build_parameters(include_co)
+    results = {}
+    windows = {}
+
+    for lat, lon, year in dict.fromkeys(points):
+        cached = response_cache.get(make_cache_key(lat, lon, year, parameters, MODEL))
+        if cached is not None:
+            results[(lat, lon, year)] = cached
+        else:
+            windows.setdefault(time_window(year), []).append((lat, lon, year))
+
+    for (startdate, enddate), group in windows.items():
+        coordinates = list(dict.fromkeys((lat, lon) for lat, lon, _ in group))
+        logger.info("Getting Meteomatics data for %d locations at %s", len(coordinates), f"{startdate:%Y-%m-%d %H:%M}")
+
+        try:
+            df = query_points(coordinates, startdate, enddate, parameters)
+            rows = split_by_coordinate(df, coordinates) if not df.empty else {}
+        except Exception as e:
+            logger.error("Error accessing Meteomatics API: %s", e)
+            rows = {}
+
+        for lat, lon, year in group:
+            cache_key = make_cache_key(lat, lon, year, parameters, MODEL)
+            row = rows.get((lat, lon))
+            if row is None:
+                results[(lat, lon, year)] = get_stale(cache_key)
+                continue
+            parsed_data = parse_row(row, parameters, startdate)
+            response_cache.set(cache_key, parsed_data, expiry_for_year(year))
+            results[(lat, lon, year)] = parsed_data
+
+    return results
+
+def get_meteomatics_timeseries(lat, lon, startdate, enddate, parameters=None):
+    """Get an hourly time series as columnar NumPy arrays
+
+    Returns {'time': int64 epoch seconds, parameter: float32 values}. Ranges
+    that are fully in the past are kept in the columnar store for good,
+    ranges reaching the current hour are refetched after one hour.
+    """
+    parameters = parameters or BASE_PARAMETERS
+    key = (f"{lat:.4f},{lon:.4f}|{startdate:%Y%m%d%H}-{enddate:%Y%m%d%H}|"
+           f"{','.join(sorted(parameters))}|{MODEL}")
+    max_age = None if enddate < utc_hour() - timedelta(hours=1) else 3600
+
+    def fetch():
+        stored = timeseries_store.get(key, max_age)
+        if stored is not None:
+            return stored
+
+        try:
+            logger.info("Getting Meteomatics time series for (%s, %s) from %s to %s", lat, lon, startdate, enddate)
+            df = query_points([(lat, lon)], startdate, enddate, parameters)
+            if df.empty:
+                logger.warning("No data returned by Meteomatics API")
+                return None
+
+            # validdate is a tz-aware DatetimeIndex; asi8 is UTC nanoseconds
+            columns = {'time': df.index.get_level_values('validdate').asi8 // 10**9}
             for param in parameters:
                 if param in df.columns:
-                    parsed_data[param] = first_row[param]
-                else:
-                    parsed_data[param] = 'N/A'
-            
-            parsed_data['co_available'] = 'co:ugm3' in parameters
-            return parsed_data
-        else:
-            print("No data returned by Meteomatics API")
+                    columns[param] = df[param].to_numpy(dtype='float32')
+            timeseries_store.set(key, columns)
+            return columns
+
+        except Exception as e:
+            logger.error("Error accessing Meteomatics API: %s", e)
             return None
-            
+
+    stored = timeseries_store.get(key, max_age)
+    if stored is not None:
+        return stored
+    return request_flight.do(key, fetch)
+
+def get_meteomatics_grid(parameter, year, south, west, north, east, resolution):
+    """Get one parameter on a lat/lon grid in a single bulk request
+
+    Returns {'lat': ascending latitudes, 'lon': ascending longitudes,
+    'values': float32 (lat x lon) matrix}, or None when it could not be
+    fetched. Callers cache what they render from it.
+    """
+    startdate, _ = time_window(year)
+    try:
+        logger.info("Getting Meteomatics %s grid for [%s, %s, %s, %s] at %s°",
+                    parameter, south, west, north, east, resolution)
+        df = query_grid(parameter, startdate, south, west, north, east, resolution)
     except Exception as e:
-        print(f"Error accessing Meteomatics API: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error accessing Meteomatics API: %s", e)
+        return None
+
+    if df.empty:
+        logger.warning("No data returned by Meteomatics API")
+        return None
+
+    df = df.sort_index().sort_index(axis=1)
+    return {
+        'lat': df.index.to_numpy(dtype='float64'),
+        'lon': df.columns.to_numpy(dtype='float64'),
+        'values': df.to_numpy(dtype='float32')
+    }
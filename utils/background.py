@@ -0,0 +1,22 @@
+# utils/background.py
+import logging
+import os
+from utils.config import CACHE_DIR, BACKGROUND_CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+def create_background_manager():
+    """DiskCache-backed manager for background callbacks, or None when unavailable"""
+    if not BACKGROUND_CALLBACKS:
+        return None
+
+    try:
+        import diskcache
+    except ImportError:
+        logger.warning("diskcache is not installed, running upstream fetches in the request thread")
+        return None
+
+    from dash import DiskcacheManager
+    return DiskcacheManager(diskcache.Cache(os.path.join(CACHE_DIR, 'background')))
+
+background_manager = create_background_manager()
@@ -0,0 +1,159 @@
+# utils/cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from utils.config import CACHE_DIR, CACHE_MEMORY_SIZE
+from utils.metrics import CACHE_LOOKUPS
+
+# Label of each lookup counter in the shared response_cache_lookups_total metric
+LOOKUP_RESULTS = {'memory_hits': 'memory', 'disk_hits': 'disk', 'misses': 'miss'}
+
+
+def make_cache_key(lat, lon, year, parameters, model):
+    """Build the cache key for a single Meteomatics point query"""
+    return f"{lat:.4f},{lon:.4f}|{year}|{','.join(sorted(parameters))}|{model}"
+
+
+def expiry_for_year(year):
+    """Past years never expire, the current year expires on the next full UTC hour"""
+    now = datetime.now(timezone.utc)
+    if year < now.year:
+        return None
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return next_hour.timestamp()
+
+
+class ResponseCache:
+    """Two-level response cache: in-memory LRU in front of a SQLite store"""
+
+    def __init__(self, path, max_memory_entries=512):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL, fetched_at REAL NOT NULL)'
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+        CACHE_LOOKUPS.inc(result=LOOKUP_RESULTS[counter])
+
+    def get(self, key, record=True):
+        """Return the cached value for key, or None when missing or expired
+
+        Lookups with record=False do not touch the hit/miss counters.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None and (entry[1] is None or entry[1] > now):
+            if record:
+                self._count('memory_hits')
+            return dict(entry[0])
+
+        row = self._connection().execute(
+            'SELECT value, expires_at, fetched_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is not None and (row[1] is None or row[1] > now):
+            entry = (json.loads(row[0]), row[1], row[2])
+            self._remember(key, entry)
+            if record:
+                self._count('disk_hits')
+            return dict(entry[0])
+
+        if record:
+            self._count('misses')
+        return None
+
+    def get_entry(self, key, max_age=None, record=True):
+        """Return (value, expires_at, fetched_at) for key, expired or not, or None
+
+        A memory entry older than max_age seconds is checked against the
+        SQLite store, which another worker may have refreshed meanwhile.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+        counter = 'memory_hits'
+
+        if entry is None or (max_age is not None and time.time() - entry[2] > max_age):
+            row = self._connection().execute(
+                'SELECT value, expires_at, fetched_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and (entry is None or row[2] > entry[2]):
+                entry = (json.loads(row[0]), row[1], row[2])
+                self._remember(key, entry)
+                counter = 'disk_hits'
+
+        if entry is None:
+            counter = 'misses'
+        if record:
+            self._count(counter)
+        return (dict(entry[0]), entry[1], entry[2]) if entry is not None else None
+
+    def get_stale(self, key):
+        """Return the last stored value for key even if it has expired, or None"""
+        entry = self.get_entry(key, record=False)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value, expires_at=None):
+        """Store value under key in both levels"""
+        entry = (dict(value), expires_at, time.time())
+        self._remember(key, entry)
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (key, value, expires_at, fetched_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(entry[0]), entry[1], entry[2])
+        )
+        conn.commit()
+
+    def clear(self):
+        """Drop every entry from both levels"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connection()
+        conn.execute('DELETE FROM responses')
+        conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the overall hit ratio"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats['hit_ratio'] = round(hits / total, 4) if total else 0.0
+        return stats
+
+
+response_cache = ResponseCache(os.path.join(CACHE_DIR, 'responses.sqlite'), CACHE_MEMORY_SIZE)
@@ -0,0 +1,136 @@
+# utils/co_sampler.py
+import logging
+import os
+import re
+import threading
+import urllib.request
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from utils.config import CACHE_DIR, GIBS_COLORMAP_URL
+from utils.compositing import decode_tile, TILE_SIZE
+from utils.helpers import mopitt_date
+from utils.tile_proxy import fetch_tile, TILE_MAX_ZOOM, USER_AGENT, UPSTREAM_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+MOPITT_LAYER = 'MOPITT_CO_Monthly_Total_Column_Day'
+
+# Column amounts are published in molecules/cm²; the gauge shows 10¹⁸ molecules/cm²
+CO_COLUMN_SCALE = 1e18
+CO_COLUMN_UNITS = '10¹⁸ molec/cm²'
+
+NUMBER_PATTERN = re.compile(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def _colormap_xml():
+    """Colormap XML of the MOPITT layer, downloaded once and kept on disk"""
+    path = os.path.join(CACHE_DIR, 'colormaps', f'{MOPITT_LAYER}.xml')
+    if os.path.exists(path):
+        with open(path, 'rb') as xml_file:
+            return xml_file.read()
+
+    url = f"{GIBS_COLORMAP_URL}/{MOPITT_LAYER}.xml"
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+        body = response.read()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as xml_file:
+        xml_file.write(body)
+    return body
+
+
+def _entry_value(entry):
+    # Values are ranges such as "[1.6e+18,1.64e+18)"; use the middle of the
+    # finite bounds so open-ended classes map to their finite edge
+    numbers = [float(n) for n in NUMBER_PATTERN.findall(entry.get('value', ''))]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+def parse_colormap(xml_body):
+    """Build the (sorted packed RGB keys, values) lookup table from colormap XML"""
+    keys, values = [], []
+    for entry in ET.fromstring(xml_body).iter('ColorMapEntry'):
+        if entry.get('nodata') == 'true' or entry.get('transparent') == 'true':
+            continue
+        value = _entry_value(entry)
+        if value is None:
+            continue
+        r, g, b = (int(channel) for channel in entry.get('rgb').split(','))
+        keys.append((r << 16) | (g << 8) | b)
+        values.append(value / CO_COLUMN_SCALE)
+
+    keys = np.asarray(keys, dtype=np.uint32)
+    order = np.argsort(keys)
+    return keys[order], np.asarray(values, dtype=np.float64)[order]
+
+
+def colormap_lookup():
+    """The MOPITT colour lookup table, loaded on first use"""
+    global _lookup
+    with _lookup_lock:
+        if _lookup is None:
+            _lookup = parse_colormap(_colormap_xml())
+        return _lookup
+
+
+def pixels_to_values(pixels):
+    """Map (..., 4) RGBA pixels to CO values through the colormap; NaN where unmapped"""
+    keys, values = colormap_lookup()
+    packed = ((pixels[..., 0].astype(np.uint32) << 16)
+              | (pixels[..., 1].astype(np.uint32) << 8)
+              | pixels[..., 2].astype(np.uint32))
+    index = np.clip(np.searchsorted(keys, packed), 0, len(keys) - 1)
+    matched = (keys[index] == packed) & (pixels[..., 3] > 0)
+    return np.where(matched, values[index], np.nan)
+
+
+def sample_co_values(points, year):
+    """Sample MOPITT CO for many (lat, lon) points in one pass
+
+    Points are projected to Level6 tile pixels, every tile involved is fetched
+    once through the tile cache, and all pixels are converted together.
+    Returns a float array in 10¹⁸ molecules/cm², NaN where there is no data.
+    """
+    if not points:
+        return np.empty(0)
+
+    z = TILE_MAX_ZOOM['mopitt']
+    n = 2 ** z
+    lat, lon = np.asarray(points, dtype=np.float64).T
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+
+    tile_x = np.clip(x.astype(np.int64), 0, n - 1)
+    tile_y = np.clip(y.astype(np.int64), 0, n - 1)
+    pixel_x = np.clip(((x - tile_x) * TILE_SIZE).astype(np.int64), 0, TILE_SIZE - 1)
+    pixel_y = np.clip(((y - tile_y) * TILE_SIZE).astype(np.int64), 0, TILE_SIZE - 1)
+
+    result = np.full(len(lat), np.nan)
+    date = mopitt_date(year)
+    tile_ids = tile_y * n + tile_x
+    for tile_id in np.unique(tile_ids):
+        body, _ = fetch_tile('mopitt', date, z, int(tile_id // n), int(tile_id % n))
+        if body is None:
+            continue
+        mask = tile_ids == tile_id
+        pixels = decode_tile(body)[pixel_y[mask], pixel_x[mask]]
+        result[mask] = pixels_to_values(pixels)
+
+    return result
+
+
+def sample_co(lat, lon, year):
+    """MOPITT CO column at one point in 10¹⁸ molecules/cm², or None"""
+    try:
+        value = sample_co_values([(lat, lon)], year)[0]
+    except Exception as e:
+        logger.error("Error sampling MOPITT CO: %s", e)
+        return None
+    return None if np.isnan(value) else float(value)
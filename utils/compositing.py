@@ -0,0 +1,111 @@
+# utils/compositing.py
+import io
+
+import numpy as np
+
+from utils.helpers import TILE_PROXY_PREFIX
+from utils.metrics import TILE_BYTES
+from utils.tile_proxy import fetch_tile, tile_cache, tile_flight, tile_response, TILE_MAX_ZOOM, DATE_PATTERN
+
+# Same opacity the MOPITT TileLayer uses when stacked on MODIS
+MOPITT_OPACITY = 0.6
+
+TILE_SIZE = 256
+
+
+def decode_tile(body):
+    """Decode an image tile into a (256, 256, 4) uint8 RGBA array"""
+    from PIL import Image
+    with Image.open(io.BytesIO(body)) as image:
+        return np.asarray(image.convert('RGBA'))
+
+
+def mopitt_pixels(date, z, y, x):
+    """RGBA pixels of the MOPITT layer for a tile, upsampled above its native zoom
+
+    MOPITT is only published up to Level6; deeper tiles are cut out of the
+    Level6 parent and enlarged with nearest-neighbour sampling, which is
+    what Leaflet would show when overzooming the layer.
+    """
+    native_z = TILE_MAX_ZOOM['mopitt']
+    dz = max(z - native_z, 0)
+    body, _ = fetch_tile('mopitt', date, z - dz, y >> dz, x >> dz)
+    if body is None:
+        return None
+
+    pixels = decode_tile(body)
+    if dz == 0:
+        return pixels
+
+    size = max(TILE_SIZE >> dz, 1)
+    row = (y - ((y >> dz) << dz)) * TILE_SIZE // (1 << dz)
+    col = (x - ((x >> dz) << dz)) * TILE_SIZE // (1 << dz)
+    crop = pixels[row:row + size, col:col + size]
+    scale = TILE_SIZE // size
+    return np.repeat(np.repeat(crop, scale, axis=0), scale, axis=1)
+
+
+def blend(base, overlay, opacity=MOPITT_OPACITY):
+    """Alpha-blend an RGBA overlay on an RGB(A) base with a layer opacity"""
+    alpha = overlay[..., 3:4].astype(np.float32) * (opacity / 255.0)
+    rgb = base[..., :3].astype(np.float32) * (1.0 - alpha) + overlay[..., :3].astype(np.float32) * alpha
+    return np.clip(rgb + 0.5, 0, 255).astype(np.uint8)
+
+
+def composite_tile(modis_date, mopitt_date, z, y, x):
+    """Return (body, content_type) of a MODIS tile with MOPITT blended on top"""
+    if not (DATE_PATTERN.match(modis_date) and DATE_PATTERN.match(mopitt_date)):
+        return None, None
+    if not 0 <= z <= TILE_MAX_ZOOM['modis']:
+        return None, None
+
+    key = f"composite/{modis_date}/{mopitt_date}/{z}/{y}/{x}"
+    body, meta = tile_cache.get(key)
+    if body is not None:
+        TILE_BYTES.inc(len(body), layer='composite', source='cache')
+        return body, meta['content_type']
+
+    def render():
+        cached_body, cached_meta = tile_cache.get(key)
+        if cached_body is not None:
+            return cached_body, cached_meta['content_type']
+
+        base_body, base_type = fetch_tile('modis', modis_date, z, y, x)
+        if base_body is None:
+            return None, None
+        overlay = mopitt_pixels(mopitt_date, z, y, x)
+        if overlay is None:
+            # Nothing to blend: serve MODIS alone rather than failing the tile
+            return base_body, base_type
+
+        from PIL import Image
+        output = io.BytesIO()
+        Image.fromarray(blend(decode_tile(base_body), overlay)).save(output, format='JPEG', quality=85)
+        composited = output.getvalue()
+        tile_cache.put(key, composited, 'image/jpeg')
+        TILE_BYTES.inc(len(composited), layer='composite', source='rendered')
+        return composited, 'image/jpeg'
+
+    return tile_flight.do(key, render)
+
+
+def warm_tile(layer, date, z, y, x):
+    """Fetch one tile of any proxied layer into the tile cache
+
+    date is the layer's date, 'modis/mopitt' for the composite (see
+    composite_date). Tiles deeper than the layer is published are skipped.
+    """
+    if layer == 'composite':
+        modis_date, _, mopitt_date = date.partition('/')
+        if z <= TILE_MAX_ZOOM['modis']:
+            composite_tile(modis_date, mopitt_date, z, y, x)
+    elif z <= TILE_MAX_ZOOM[layer]:
+        fetch_tile(layer, date, z, y, x)
+
+
+def register_compositing(server):
+    """Add the composited MODIS+MOPITT tile route to the Flask server"""
+
+    @server.route(f"{TILE_PROXY_PREFIX}/composite/<modis_date>/<mopitt_date>/<int:z>/<int:y>/<int:x>")
+    def serve_composite_tile(modis_date, mopitt_date, z, y, x):
+        return tile_response(*composite_tile(modis_date, mopitt_date, z, y, x))
@@ -9,10 +9,92 @@ METEOMATICS_USERNAME = os.getenv('METEOMATICS_USERNAME', '')
 METEOMATICS_PASSWORD = os.getenv('METEOMATICS_PASSWORD', '')
 
 # App Configuration
-DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
+DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 PORT = int(os.getenv('PORT', '8050'))
 HOST = os.getenv('HOST', '0.0.0.0')
 
 # Map Configuration
 DEFAULT_CENTER = [30.0, 100.0]
-DEFAULT_ZOOM = 3
\ No newline at end of file
+DEFAULT_ZOOM = 3
+
+# Cache Configuration
+CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+CACHE_MEMORY_SIZE = int(os.getenv('CACHE_MEMORY_SIZE', '512'))
+
+# Historical Data Store ('sqlite' is shared by all workers, 'memory' is per process)
+HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'sqlite')
+HISTORY_MAX_SERIES = int(os.getenv('HISTORY_MAX_SERIES', '2048'))
+HISTORY_TTL_HOURS = int(os.getenv('HISTORY_TTL_HOURS', '24'))
+
+# Time Series Mode
+TIMESERIES_MAX_POINTS = int(os.getenv('TIMESERIES_MAX_POINTS', '600'))
+
+# Tile Proxy Configuration
+TILE_PROXY_ENABLED = os.getenv('TILE_PROXY_ENABLED', 'True').lower() == 'true'
+TILE_CACHE_MAX_MB = int(os.getenv('TILE_CACHE_MAX_MB', '512'))
+TILE_REVALIDATE_HOURS = int(os.getenv('TILE_REVALIDATE_HOURS', '24'))
+GIBS_BASE_URL = os.getenv('GIBS_BASE_URL', 'https://gibs.earthdata.nasa.gov/wmts/epsg3857/best')
+ESRI_BASE_URL = os.getenv('ESRI_BASE_URL', 'https://server.arcgisonline.com/ArcGIS/rest/services')
+GIBS_COLORMAP_URL = os.getenv('GIBS_COLORMAP_URL', 'https://gibs.earthdata.nasa.gov/colormaps/v1.3')
+
+# CO Source ('mopitt' samples the MOPITT tiles, 'meteomatics' requests co:ugm3)
+CO_SOURCE = os.getenv('CO_SOURCE', 'mopitt')
+
+# Animation Configuration
+FIRST_YEAR = 2016
+LAST_YEAR = 2024
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', '4'))
+PREFETCH_YEARS = int(os.getenv('PREFETCH_YEARS', '3'))
+PREFETCH_MAX_TILES = int(os.getenv('PREFETCH_MAX_TILES', '48'))
+
+# Background Callbacks (opt-in: each job runs in a forked process that loses in-memory caches,
+# coalescing and refresh threads, so use the sqlite history backend with it)
+BACKGROUND_CALLBACKS = os.getenv('BACKGROUND_CALLBACKS', 'False').lower() == 'true'
+BACKGROUND_POLL_MS = int(os.getenv('BACKGROUND_POLL_MS', '200'))
+
+# Meteomatics Rate Limiting and Resilience (shared by all processes through CACHE_DIR)
+METEOMATICS_RATE_PER_SECOND = float(os.getenv('METEOMATICS_RATE_PER_SECOND', '2'))
+METEOMATICS_BURST = int(os.getenv('METEOMATICS_BURST', '5'))
+METEOMATICS_RATE_WAIT_SECONDS = float(os.getenv('METEOMATICS_RATE_WAIT_SECONDS', '10'))
+METEOMATICS_RETRIES = int(os.getenv('METEOMATICS_RETRIES', '3'))
+METEOMATICS_TIMEOUT_SECONDS = float(os.getenv('METEOMATICS_TIMEOUT_SECONDS', '15'))
+METEOMATICS_BREAKER_FAILURES = int(os.getenv('METEOMATICS_BREAKER_FAILURES', '5'))
+METEOMATICS_BREAKER_RESET_SECONDS = int(os.getenv('METEOMATICS_BREAKER_RESET_SECONDS', '60'))
+
+# Current-year data older than this is refreshed in the background while the cached value is served
+CURRENT_DATA_MAX_AGE_MINUTES = int(os.getenv('CURRENT_DATA_MAX_AGE_MINUTES', '15'))
+
+# Production Server (gunicorn.conf.py) and Startup Warm-up
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', str(min(2 * (os.cpu_count() or 1) + 1, 8))))
+WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '120'))
+# No Meteomatics retry is started that could run past this, so a callback never outlives its worker
+METEOMATICS_DEADLINE_SECONDS = float(os.getenv('METEOMATICS_DEADLINE_SECONDS', str(WEB_TIMEOUT / 2)))
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True').lower() == 'true'
+WARMUP_TILES = os.getenv('WARMUP_TILES', 'True').lower() == 'true'
+WARMUP_WORKERS = int(os.getenv('WARMUP_WORKERS', '8'))
+
+# Logging and Metrics (/metrics in Prometheus text format, totals of every process sharing CACHE_DIR;
+# each process adds its updates up in memory and writes them every METRICS_FLUSH_SECONDS)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+# Location Catalog (GAZETTEER_PATH: CSV with name, country, lat, lon and optional population and admin1)
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+CATALOG_CELL_DEGREES = float(os.getenv('CATALOG_CELL_DEGREES', '1.0'))
+SEARCH_MAX_OPTIONS = int(os.getenv('SEARCH_MAX_OPTIONS', '20'))
+
+# Map Click Point Queries (snapped to the model grid so nearby clicks share a cache entry)
+POINT_GRID_RESOLUTION = float(os.getenv('POINT_GRID_RESOLUTION', '0.25'))
+POINT_NEAREST_MAX_KM = float(os.getenv('POINT_NEAREST_MAX_KM', '150'))
+CLICK_BATCH_WINDOW_MS = int(os.getenv('CLICK_BATCH_WINDOW_MS', '300'))
+
+# Gridded Field Overlay (one bulk grid query per viewport, rendered to a PNG overlay)
+FIELD_GRID_CELLS = int(os.getenv('FIELD_GRID_CELLS', '100'))
+FIELD_IMAGE_WIDTH = int(os.getenv('FIELD_IMAGE_WIDTH', '512'))
+
+# Offline Ingestion (python -m utils.ingest; upstream calls share the Meteomatics rate limit)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '4'))
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '50'))
@@ -0,0 +1,96 @@
+# utils/downsample.py
+import numpy as np
+
+
+def _drop_nan(x, y):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    mask = ~np.isnan(y)
+    return x[mask], y[mask]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling to at most n_out points
+
+    Keeps the visual shape of a line series; NaN samples are dropped.
+    """
+    x, y = _drop_nan(x, y)
+    n = len(y)
+    if n_out >= n:
+        return x, y
+    if n_out < 3:
+        # Too few points for a middle bucket: keep the end points that fit
+        selected = np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+        return x[selected], y[selected]
+
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = xf[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area for every candidate in the bucket at once
+        area = np.abs((xf[a] - avg_x) * (y[start:end] - y[a])
+                      - (xf[a] - xf[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def minmax_decimate(x, y, n_out):
+    """Keep the minimum and maximum of each bucket, at most n_out points
+
+    Preserves peaks, which suits spiky series such as precipitation. With
+    n_out of 1 only the maximum is kept.
+    """
+    x, y = _drop_nan(x, y)
+    n = len(y)
+    if n <= n_out:
+        return x, y
+    if n_out < 2:
+        selected = np.array([int(y.argmax())] if n_out == 1 else [], dtype=np.int64)
+        return x[selected], y[selected]
+
+    buckets = n_out // 2
+
+    size = -(-n // buckets)
+    padded_low = np.full(buckets * size, np.inf)
+    padded_high = np.full(buckets * size, -np.inf)
+    padded_low[:n] = y
+    padded_high[:n] = y
+
+    offsets = np.arange(buckets) * size
+    low = offsets + padded_low.reshape(buckets, size).argmin(axis=1)
+    high = offsets + padded_high.reshape(buckets, size).argmax(axis=1)
+    selected = np.unique(np.concatenate([low, high]))
+    selected = selected[selected < n]
+    return x[selected], y[selected]
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': minmax_decimate
+}
+
+
+def downsample_columns(columns, max_points, methods):
+    """Downsample the columns of a time series independently
+
+    methods maps parameter names to 'lttb' or 'minmax'. Returns
+    {parameter: (times, values)} with times as datetime64 arrays.
+    """
+    times = np.asarray(columns['time']).astype('datetime64[s]')
+    return {
+        name: DOWNSAMPLERS[method](times, columns[name], max_points)
+        for name, method in methods.items() if name in columns
+    }
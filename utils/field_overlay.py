@@ -0,0 +1,204 @@
+# utils/field_overlay.py
+import io
+import math
+
+import numpy as np
+from flask import abort
+
+from utils.api_client import get_meteomatics_grid, time_window
+from utils.config import FIELD_GRID_CELLS, FIELD_IMAGE_WIDTH, FIRST_YEAR, LAST_YEAR
+from utils.helpers import FIELD_PREFIX
+from utils.metrics import TILE_BYTES
+from utils.tile_proxy import tile_cache, tile_flight, tile_response
+
+# Fixed value ranges keep colours comparable across years and viewports
+FIELDS = {
+    'temperature': {
+        'parameter': 't_2m:C',
+        'label': '🌡️ Temperature',
+        'range': (-30.0, 45.0),
+        'stops': [(0.0, (49, 54, 149, 200)), (0.4, (116, 173, 209, 200)), (0.55, (255, 255, 191, 200)),
+                  (0.75, (253, 174, 97, 200)), (1.0, (165, 0, 38, 200))]
+    },
+    'precipitation': {
+        'parameter': 'precip_1h:mm',
+        'label': '🌧️ Precipitation',
+        'range': (0.0, 10.0),
+        'stops': [(0.0, (255, 255, 255, 0)), (0.02, (198, 219, 239, 120)),
+                  (0.3, (66, 146, 198, 200)), (1.0, (8, 48, 107, 230))]
+    },
+    'co': {
+        'parameter': 'co:ugm3',
+        'label': '🌫️ CO',
+        'range': (0.0, 800.0),
+        'stops': [(0.0, (255, 255, 204, 120)), (0.5, (253, 141, 60, 190)), (1.0, (128, 0, 38, 230))]
+    }
+}
+
+# Grid spacings (degrees) a viewport is rounded to, so nearby views share images
+FIELD_RESOLUTIONS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+MAX_LATITUDE = 85.0
+
+
+def colormap_lut(stops):
+    """(256, 4) uint8 RGBA lookup table interpolated between (position, rgba) stops"""
+    positions = np.array([position for position, _ in stops])
+    colours = np.array([rgba for _, rgba in stops], dtype=np.float64)
+    samples = np.linspace(0.0, 1.0, 256)
+    return np.stack([np.interp(samples, positions, colours[:, channel]) for channel in range(4)],
+                    axis=1).round().astype(np.uint8)
+
+
+def field_resolution(bounds):
+    """Coarsest listed spacing that still gives about FIELD_GRID_CELLS cells across the view"""
+    (south, west), (north, east) = bounds
+    span = max(north - south, east - west)
+    for resolution in FIELD_RESOLUTIONS:
+        if span / resolution <= FIELD_GRID_CELLS:
+            return resolution
+    return FIELD_RESOLUTIONS[-1]
+
+
+def longitude_offset(west):
+    """Multiple of 360 that brings a (possibly wrapped) west edge into [-180, 180)"""
+    return math.floor((west + 180.0) / 360.0) * 360.0
+
+
+def field_bbox(bounds, resolution):
+    """Viewport bounds widened to multiples of 8 grid cells and clamped to the map
+
+    Longitudes of a wrapped world copy are brought back into [-180, 180]
+    first; a view crossing the antimeridian is cut at 180.
+    """
+    (south, west), (north, east) = bounds
+    offset = longitude_offset(west)
+    west, east = west - offset, east - offset
+    step = resolution * 8
+    south = max(math.floor(south / step) * step, -MAX_LATITUDE)
+    north = min(math.ceil(north / step) * step, MAX_LATITUDE)
+    west = max(math.floor(west / step) * step, -180.0)
+    east = min(math.ceil(east / step) * step, 180.0)
+    return round(south, 4), round(west, 4), round(north, 4), round(east, 4)
+
+
+def valid_stamp(year):
+    """Hour the field of a year is valid for; it only moves for the current year"""
+    return f"{time_window(year)[0]:%Y%m%d%H}"
+
+
+def make_field_url(field, year, bounds):
+    """(url, overlay bounds) of the field image covering a viewport
+
+    The valid hour is part of the URL so browsers pick up hourly updates
+    of the current year instead of a cached image.
+    """
+    resolution = field_resolution(bounds)
+    south, west, north, east = field_bbox(bounds, resolution)
+    url = f"{FIELD_PREFIX}/{field}/{year}/{valid_stamp(year)}/{south}/{west}/{north}/{east}/{resolution}.png"
+    # The image is placed on the world copy the viewport is looking at
+    offset = longitude_offset(bounds[0][1])
+    return url, [[south, west + offset], [north, east + offset]]
+
+
+def is_field_edge(value, step, limit):
+    """Whether value is a bbox edge field_bbox can produce: a multiple of step or the map limit"""
+    if abs(value) == limit:
+        return True
+    return abs(value / step - round(value / step)) < 1e-6
+
+
+def _mercator_y(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def render_field(grid, field, south, west, north, east):
+    """PNG of a grid coloured with the field's colormap, resampled for Leaflet
+
+    Leaflet stretches an ImageOverlay linearly in Web Mercator, so output
+    rows are spaced evenly in Mercator y and their latitudes interpolated
+    from the regular lat/lon grid.
+    """
+    from PIL import Image
+
+    spec = FIELDS[field]
+    lats, lons, values = grid['lat'], grid['lon'], grid['values']
+
+    width = FIELD_IMAGE_WIDTH
+    aspect = (_mercator_y(north) - _mercator_y(south)) / np.radians(east - west)
+    height = min(max(int(round(width * aspect)), 1), width * 4)
+
+    row_lats = np.degrees(np.arctan(np.sinh(np.linspace(_mercator_y(north), _mercator_y(south), height))))
+    column_lons = np.linspace(west, east, width)
+
+    # Bilinear interpolation at fractional grid indices, all rows and columns at once
+    row_index = np.interp(row_lats, lats, np.arange(len(lats)))
+    column_index = np.interp(column_lons, lons, np.arange(len(lons)))
+    r0 = np.floor(row_index).astype(np.int64)
+    c0 = np.floor(column_index).astype(np.int64)
+    r1 = np.minimum(r0 + 1, len(lats) - 1)
+    c1 = np.minimum(c0 + 1, len(lons) - 1)
+    dr = (row_index - r0)[:, None]
+    dc = (column_index - c0)[None, :]
+    top = values[r0][:, c0] * (1 - dc) + values[r0][:, c1] * dc
+    bottom = values[r1][:, c0] * (1 - dc) + values[r1][:, c1] * dc
+    sampled = top * (1 - dr) + bottom * dr
+
+    low, high = spec['range']
+    scaled = np.clip((sampled - low) / (high - low), 0.0, 1.0)
+    indices = np.nan_to_num(scaled * 255).round().astype(np.uint8)
+    rgba = colormap_lut(spec['stops'])[indices]
+    rgba[np.isnan(sampled)] = 0
+
+    output = io.BytesIO()
+    Image.fromarray(rgba).save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def field_image(field, year, south, west, north, east, resolution):
+    """Return (body, content_type) of a rendered field image, from cache or upstream"""
+    if field not in FIELDS or resolution not in FIELD_RESOLUTIONS or not FIRST_YEAR <= year <= LAST_YEAR:
+        return None, None
+    if not (-MAX_LATITUDE <= south < north <= MAX_LATITUDE and -180.0 <= west < east <= 180.0):
+        return None, None
+    # Only the aligned boxes make_field_url hands out, so requests cannot multiply grid queries
+    step = resolution * 8
+    if not (all(is_field_edge(value, step, MAX_LATITUDE) for value in (south, north))
+            and all(is_field_edge(value, step, 180.0) for value in (west, east))):
+        return None, None
+    if (north - south) / resolution > FIELD_GRID_CELLS * 2 or (east - west) / resolution > FIELD_GRID_CELLS * 2:
+        return None, None
+
+    key = f"field/{field}/{valid_stamp(year)}/{south}/{west}/{north}/{east}/{resolution}"
+    body, meta = tile_cache.get(key)
+    if body is not None:
+        TILE_BYTES.inc(len(body), layer='field', source='cache')
+        return body, meta['content_type']
+
+    def render():
+        cached_body, cached_meta = tile_cache.get(key)
+        if cached_body is not None:
+            return cached_body, cached_meta['content_type']
+
+        grid = get_meteomatics_grid(FIELDS[field]['parameter'], year, south, west, north, east, resolution)
+        if grid is None:
+            return None, None
+        rendered = render_field(grid, field, south, west, north, east)
+        tile_cache.put(key, rendered, 'image/png')
+        TILE_BYTES.inc(len(rendered), layer='field', source='rendered')
+        return rendered, 'image/png'
+
+    return tile_flight.do(key, render)
+
+
+def register_field_overlay(server):
+    """Add the rendered field image route to the Flask server"""
+
+    # The stamp in the URL only busts browser caches; the server always renders the current hour
+    @server.route(f"{FIELD_PREFIX}/<field>/<int:year>/<stamp>/<south>/<west>/<north>/<east>/<resolution>.png")
+    def serve_field_image(field, year, stamp, south, west, north, east, resolution):
+        try:
+            south, west, north, east, resolution = (float(value) for value in (south, west, north, east, resolution))
+        except ValueError:
+            abort(404)
+        return tile_response(*field_image(field, year, south, west, north, east, resolution))
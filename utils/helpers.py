@@ -1,18 +1,92 @@
 # utils/helpers.py
-from datetime import datetime, timedelta
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from utils.config import TILE_PROXY_ENABLED, GIBS_BASE_URL, ESRI_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_TILE_URLS = {
+    'modis': GIBS_BASE_URL + "/MODIS_Terra_CorrectedReflectance_TrueColor/default/{date}/GoogleMapsCompatible_Level9/{z}/{y}/{x}.jpg",
+    'mopitt': GIBS_BASE_URL + "/MOPITT_CO_Monthly_Total_Column_Day/default/{date}/GoogleMapsCompatible_Level6/{z}/{y}/{x}.png",
+    'borders': ESRI_BASE_URL + "/Reference/World_Boundaries_and_Places/MapServer/tile/{z}/{y}/{x}"
+}
+
+TILE_PROXY_PREFIX = '/tiles'
+FIELD_PREFIX = '/fields'
+
+def tile_url(layer, date='default'):
+    """URL template of a tile layer, served through the local proxy when enabled"""
+    if TILE_PROXY_ENABLED:
+        return f"{TILE_PROXY_PREFIX}/{layer}/{date}/{{z}}/{{y}}/{{x}}"
+    return UPSTREAM_TILE_URLS[layer].replace('{date}', date)
+
+def modis_date(year):
+    """Date of the MODIS imagery shown for a year"""
+    return f"{year}-06-15"
+
+def mopitt_date(year):
+    """Date of the MOPITT monthly product shown for a year"""
+    now = datetime.now(timezone.utc)
+    if year == now.year:
+        target_date = now - timedelta(days=60)
+        return target_date.strftime("%Y-%m-15")
+    return f"{year}-06-15"
 
 def make_modis_url(year):
-    date = f"{year}-06-15"
-    return f"https://gibs.earthdata.nasa.gov/wmts/epsg3857/best/MODIS_Terra_CorrectedReflectance_TrueColor/default/{date}/GoogleMapsCompatible_Level9/{{z}}/{{y}}/{{x}}.jpg"
+    return tile_url('modis', modis_date(year))
 
 def make_mopitt_url(year):
     """Generate URL for MOPITT data (Carbon Monoxide) based on year"""
-    current_year = datetime.now().year
-    if year == current_year:
-        target_date = datetime.now() - timedelta(days=60)
-        date = target_date.strftime("%Y-%m-15")
-    else:
-        date = f"{year}-06-15"
-    
-    print(f"MOPITT URL for year {year}: using date {date}")
-    return f"https://gibs.earthdata.nasa.gov/wmts/epsg3857/best/MOPITT_CO_Monthly_Total_Column_Day/default/{date}/GoogleMapsCompatible_Level6/{{z}}/{{y}}/{{x}}.png"
\ No newline at end of file
+    date = mopitt_date(year)
+    logger.debug("MOPITT URL for year %s: using date %s", year, date)
+    return tile_url('mopitt', date)
+
+def make_borders_url():
+    """Generate URL for the Esri borders and places reference layer"""
+    return tile_url('borders')
+
+def lat_lon_to_tile(lat, lon, z):
+    """Fractional Web Mercator tile coordinates (x, y) of a point at zoom z"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+def snap_to_grid(lat, lon, resolution):
+    """Nearest grid node to a point, so nearby points share one cache entry"""
+    snapped_lat = max(min(round(lat / resolution) * resolution, 90.0), -90.0)
+    snapped_lon = (round(lon / resolution) * resolution + 180.0) % 360.0 - 180.0
+    return round(snapped_lat, 4), round(snapped_lon, 4)
+
+def region_bounds(lat, lon, zoom):
+    """[[south, west], [north, east]] of roughly one screen around a point at zoom"""
+    span = 360.0 / 2 ** zoom * 2
+    return [[lat - span / 2, lon - span], [lat + span / 2, lon + span]]
+
+def tiles_in_bounds(bounds, z, max_tiles=None):
+    """List (z, y, x) tiles covering [[south, west], [north, east]] at zoom z
+
+    Tiles nearest to the centre come first so a max_tiles cut keeps the
+    middle of the view.
+    """
+    (south, west), (north, east) = bounds
+    n = 2 ** z
+    x0, y0 = lat_lon_to_tile(north, west, z)
+    x1, y1 = lat_lon_to_tile(south, east, z)
+    xs = range(max(int(x0), 0), min(int(x1), n - 1) + 1)
+    ys = range(max(int(y0), 0), min(int(y1), n - 1) + 1)
+
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    tiles = sorted(((z, y, x) for y in ys for x in xs),
+                   key=lambda tile: (tile[2] + 0.5 - cx) ** 2 + (tile[1] + 0.5 - cy) ** 2)
+    return tiles[:max_tiles] if max_tiles else tiles
+
+def composite_date(year):
+    """Date of the composite layer for a year: its MODIS and MOPITT dates as 'modis/mopitt'"""
+    return f"{modis_date(year)}/{mopitt_date(year)}"
+
+def make_composite_url(year):
+    """URL of the server-side MODIS+MOPITT composite for a year (proxy only)"""
+    return f"{TILE_PROXY_PREFIX}/composite/{composite_date(year)}/{{z}}/{{y}}/{{x}}"
@@ -0,0 +1,123 @@
+# utils/history_store.py
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.config import CACHE_DIR, HISTORY_BACKEND, HISTORY_MAX_SERIES, HISTORY_TTL_HOURS
+
+HISTORY_FIELDS = ('temperature', 'precipitation', 'co_concentration')
+
+
+class MemoryHistoryStore:
+    """Per-process LRU of (session, region) series
+
+    The least recently used series is dropped once max_series is reached.
+    Data is lost on restart and is not shared between workers.
+    """
+
+    def __init__(self, max_series=2048):
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, session_id, region_name, year, values):
+        """Store the values of one year for a session and region"""
+        key = (session_id, region_name)
+        with self._lock:
+            series = self._series.setdefault(key, {})
+            series[year] = {field: values.get(field) for field in HISTORY_FIELDS}
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+
+    def get_series(self, session_id, region_name):
+        """Return {year: values} for a session and region"""
+        key = (session_id, region_name)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return {}
+            self._series.move_to_end(key)
+            return {year: dict(values) for year, values in series.items()}
+
+
+class SQLiteHistoryStore:
+    """History shared by every worker through a SQLite file
+
+    Rows that were not updated for ttl_hours are pruned, so the file stays
+    bounded while surviving restarts.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, path, ttl_hours=24):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                'session_id TEXT NOT NULL, region TEXT NOT NULL, year INTEGER NOT NULL, '
+                'temperature REAL, precipitation REAL, co_concentration REAL, '
+                'updated_at REAL NOT NULL, '
+                'PRIMARY KEY (session_id, region, year))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS history_updated ON history (updated_at)')
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _prune(self, conn):
+        conn.execute('DELETE FROM history WHERE updated_at < ?', (time.time() - self.ttl_seconds,))
+
+    def record(self, session_id, region_name, year, values):
+        """Store the values of one year for a session and region"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO history '
+            '(session_id, region, year, temperature, precipitation, co_concentration, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (session_id, region_name, year) + tuple(values.get(field) for field in HISTORY_FIELDS) + (now,)
+        )
+        # Touch the rest of the series so an active session is never pruned
+        conn.execute('UPDATE history SET updated_at = ? WHERE session_id = ? AND region = ?',
+                     (now, session_id, region_name))
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self._prune(conn)
+        conn.commit()
+
+    def get_series(self, session_id, region_name):
+        """Return {year: values} for a session and region in one query"""
+        rows = self._connection().execute(
+            'SELECT year, temperature, precipitation, co_concentration FROM history '
+            'WHERE session_id = ? AND region = ? ORDER BY year',
+            (session_id, region_name)
+        ).fetchall()
+        return {row[0]: dict(zip(HISTORY_FIELDS, row[1:])) for row in rows}
+
+
+def create_history_store(backend=HISTORY_BACKEND):
+    """Build the history store selected by HISTORY_BACKEND"""
+    if backend == 'memory':
+        return MemoryHistoryStore(HISTORY_MAX_SERIES)
+    if backend == 'sqlite':
+        return SQLiteHistoryStore(os.path.join(CACHE_DIR, 'history.sqlite'), HISTORY_TTL_HOURS)
+    raise ValueError(f"Unknown history backend: {backend}")
+
+
+history_store = create_history_store()
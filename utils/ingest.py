@@ -0,0 +1,201 @@
+# utils/ingest.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from data.catalog import catalog, resolve_region
+from data.regions import REGIONS_DATA
+from utils.api_client import BASE_PARAMETERS, CO_PARAMETERS, get_meteomatics_data_batch
+from utils.config import (
+    CACHE_DIR, CO_SOURCE, FIRST_YEAR, LAST_YEAR, INGEST_WORKERS, INGEST_CHUNK_SIZE
+)
+from utils.logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'ingest')
+
+
+def default_parameter_sets():
+    """The parameter lists the dashboard reads from the response cache"""
+    # The CO parameter is only requested upstream with the meteomatics source
+    if CO_SOURCE == 'meteomatics':
+        return [BASE_PARAMETERS, BASE_PARAMETERS + CO_PARAMETERS]
+    return [BASE_PARAMETERS]
+
+
+def resolve_locations(names=None, all_locations=False):
+    """Unique (lat, lon) of the named regions, of the whole catalog, or of the built-in cities"""
+    if all_locations:
+        names = catalog.names
+    elif not names:
+        names = list(REGIONS_DATA)
+
+    locations = []
+    for name in names:
+        region = resolve_region(name)
+        if region is None:
+            logger.warning("Unknown region %s, skipped", name)
+            continue
+        locations.append((region['lat'], region['lon']))
+    return list(dict.fromkeys(locations))
+
+
+def plan_chunks(locations, years, parameter_sets, chunk_size=INGEST_CHUNK_SIZE):
+    """Chunks of up to chunk_size locations sharing one year and parameter list
+
+    Every chunk is sent upstream as one multi-coordinate query.
+    """
+    chunks = []
+    for parameters in parameter_sets:
+        for year in years:
+            for start in range(0, len(locations), chunk_size):
+                chunks.append({
+                    'id': f"{','.join(parameters)}|{year}|{start}",
+                    'year': year,
+                    'parameters': list(parameters),
+                    'coordinates': locations[start:start + chunk_size]
+                })
+    return chunks
+
+
+def checkpoint_path(locations, years, parameter_sets, chunk_size):
+    """Checkpoint file of a job; chunk ids are only meaningful for the same job"""
+    job = json.dumps([locations, list(years), parameter_sets, chunk_size])
+    return os.path.join(CHECKPOINT_DIR, f"{hashlib.sha1(job.encode()).hexdigest()[:16]}.json")
+
+
+class Checkpoint:
+    """Ids of the completed chunks of a job, rewritten atomically after every chunk"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as checkpoint_file:
+                self.done = set(json.load(checkpoint_file)['done'])
+        except FileNotFoundError:
+            self.done = set()
+        except (ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", path, e)
+            self.done = set()
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.done
+
+    def mark(self, chunk_id):
+        with self._lock:
+            self.done.add(chunk_id)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, 'w') as checkpoint_file:
+                json.dump({'done': sorted(self.done), 'updated': time.time()}, checkpoint_file)
+            os.replace(temporary, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.done.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def ingest_chunk(chunk):
+    """Fetch one chunk into the response cache; returns the number of points that failed"""
+    points = [(lat, lon, chunk['year']) for lat, lon in chunk['coordinates']]
+    results = get_meteomatics_data_batch(points, parameters=chunk['parameters'])
+    return sum(1 for point in points if results.get(point) is None)
+
+
+def ingest(locations, years, parameter_sets=None, workers=INGEST_WORKERS, chunk_size=INGEST_CHUNK_SIZE,
+           restart=False):
+    """Fetch every location, year and parameter list into the response cache
+
+    Chunks run on a thread pool and every upstream call goes through the
+    rate limiter and circuit breaker shared with the running app. Completed
+    chunks of past years are checkpointed and skipped when an interrupted
+    job is run again; current-year values expire within the hour so they
+    are always refetched. The checkpoint is removed once every chunk succeeded.
+    Returns (chunks ingested, chunks failed).
+    """
+    parameter_sets = [list(parameters) for parameters in (parameter_sets or default_parameter_sets())]
+    chunks = plan_chunks(locations, years, parameter_sets, chunk_size)
+    checkpoint = Checkpoint(checkpoint_path(locations, years, parameter_sets, chunk_size))
+    if restart:
+        checkpoint.clear()
+
+    pending = [chunk for chunk in chunks if chunk['id'] not in checkpoint]
+    logger.info("Ingesting %d locations x %d years x %d parameter lists: %d chunks, %d already done",
+                len(locations), len(years), len(parameter_sets), len(pending), len(chunks) - len(pending))
+
+    current_year = datetime.now(timezone.utc).year
+    started = time.monotonic()
+    failed = 0
+    executor = ThreadPoolExecutor(workers, thread_name_prefix='ingest')
+    try:
+        futures = {executor.submit(ingest_chunk, chunk): chunk for chunk in pending}
+        for completed, future in enumerate(as_completed(futures), 1):
+            chunk = futures[future]
+            try:
+                missing = future.result()
+            except Exception as e:
+                logger.error("Chunk %s failed: %s", chunk['id'], e)
+                missing = len(chunk['coordinates'])
+
+            if missing:
+                failed += 1
+                logger.warning("Chunk %s: %d of %d points failed", chunk['id'], missing, len(chunk['coordinates']))
+            elif chunk['year'] < current_year:
+                checkpoint.mark(chunk['id'])
+
+            if completed % 10 == 0 or completed == len(pending):
+                logger.info("Ingested %d/%d chunks (%d failed)", completed, len(pending), failed)
+    finally:
+        # On Ctrl-C drop the queued chunks; the checkpoint keeps the finished ones
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if not failed:
+        checkpoint.clear()
+    logger.info("Ingestion finished in %.1fs: %d chunks ingested, %d failed",
+                time.monotonic() - started, len(pending) - failed, failed)
+    return len(pending) - failed, failed
+
+
+def parse_years(text):
+    """Years of '2016-2024' or '2020'"""
+    first, _, last = text.partition('-')
+    return list(range(int(first), int(last or first) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch Meteomatics point data into the response cache")
+    parser.add_argument('--regions', nargs='+', metavar='NAME',
+                        help="catalog or point names (default: the built-in cities)")
+    parser.add_argument('--all-locations', action='store_true', help="every catalog location, gazetteer included")
+    parser.add_argument('--years', type=parse_years, default=list(range(FIRST_YEAR, LAST_YEAR + 1)),
+                        help=f"year or range (default: {FIRST_YEAR}-{LAST_YEAR})")
+    parser.add_argument('--parameters', action='append', type=lambda text: text.split(','), metavar='LIST',
+                        help="comma-separated parameter list, repeatable (default: the lists the dashboard reads)")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=INGEST_CHUNK_SIZE, help="locations per upstream query")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint of a previous run")
+    args = parser.parse_args()
+
+    configure_logging()
+    locations = resolve_locations(args.regions, args.all_locations)
+    if not locations:
+        parser.error("no known regions to ingest")
+
+    _, failed = ingest(locations, args.years, args.parameters, args.workers, args.chunk_size, args.restart)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
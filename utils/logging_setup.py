@@ -0,0 +1,66 @@
+# utils/logging_setup.py
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+from utils.config import LOG_LEVEL, LOG_FORMAT
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _stream_handler(log_format):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Send application logs to stderr from a background thread
+
+    Request threads only put records on a queue; the listener thread does
+    the formatting and the blocking writes. The listener thread is not
+    copied into forked children (background callback jobs), so there the
+    queue is replaced by a handler writing to stderr directly. Calling it
+    again is a no-op.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, _stream_handler(log_format))
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    def log_directly_in_child():
+        atexit.unregister(_listener.stop)
+        root.removeHandler(queue_handler)
+        root.addHandler(_stream_handler(log_format))
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=log_directly_in_child)
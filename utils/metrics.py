@@ -0,0 +1,349 @@
+# utils/metrics.py
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+from utils.config import CACHE_DIR, METRICS_ENABLED, METRICS_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Seconds, for callback and upstream latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Bytes, for callback response payloads
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REGISTRY = []
+
+
+class MetricStore:
+    """Metric values in a SQLite file shared by every process using CACHE_DIR
+
+    Gunicorn workers and forked background jobs add to the same rows, so
+    updates made in a job outlive its process and any worker's /metrics
+    reports the totals. Rows are (metric, labels, field): '' for a counter,
+    a bucket index, 'sum' or 'count' for a histogram.
+
+    Updates are summed in memory and written in one transaction every
+    flush_interval seconds, before every read and at exit, so the request
+    path never waits on the file lock. Forked background jobs are killed
+    once their result is read, so they write every update at once.
+    """
+
+    def __init__(self, path, flush_interval=METRICS_FLUSH_SECONDS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flusher = None
+        self._write_through = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._write_through_in_child)
+
+    def _write_through_in_child(self):
+        # The parent's pending updates are its own to write, and its flush thread is gone
+        self._pending, self._pending_lock, self._flusher = {}, threading.Lock(), None
+        self._write_through = True
+
+    def _connection(self):
+        # A connection must not cross a fork: reopen it in child processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metric_values ('
+                'metric TEXT NOT NULL, labels TEXT NOT NULL, field TEXT NOT NULL, value REAL NOT NULL, '
+                'PRIMARY KEY (metric, labels, field))'
+            )
+            conn.commit()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def add(self, updates):
+        """Add (metric, labels tuple, field, amount) updates"""
+        if self._write_through:
+            self._write({(metric, labels, field): amount for metric, labels, field, amount in updates})
+            return
+        with self._pending_lock:
+            self._merge(updates)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _merge(self, updates):
+        for metric, labels, field, amount in updates:
+            key = (metric, labels, field)
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write the updates summed in memory; they are kept for the next flush if that fails"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if pending and not self._write(pending):
+            with self._pending_lock:
+                self._merge((*key, amount) for key, amount in pending.items())
+
+    def _write(self, pending):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO metric_values (metric, labels, field, value) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (metric, labels, field) DO UPDATE SET value = value + excluded.value',
+                    [(metric, json.dumps(labels), field, amount) for (metric, labels, field), amount in pending.items()]
+                )
+            return True
+        except (sqlite3.Error, OSError) as e:
+            # Metrics must never fail the request they describe
+            logger.warning("Could not write %d metric updates to %s: %s", len(pending), self.path, e)
+            return False
+
+    def read(self, metric):
+        """{labels tuple: {field: value}} of a metric, this process's pending updates included"""
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT labels, field, value FROM metric_values WHERE metric = ?', (metric,)
+        ).fetchall()
+        values = {}
+        for labels, field, value in rows:
+            values.setdefault(tuple(json.loads(labels)), {})[field] = value
+        return values
+
+
+metric_store = MetricStore(os.path.join(CACHE_DIR, 'metrics.sqlite'))
+
+
+def _number(value):
+    return int(value) if value == int(value) else value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Base of the Prometheus metrics, whose values live in a MetricStore
+
+    When metrics are disabled every update returns straight away, so the
+    instrumentation left in hot paths costs a single attribute check.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=(), enabled=METRICS_ENABLED, store=metric_store):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.enabled = enabled
+        self.store = store
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def values(self):
+        """{labels tuple: value} of a counter"""
+        return {key: _number(fields.get('', 0)) for key, fields in self.store.read(self.name).items()}
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.values().items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self.enabled:
+            return
+        self.store.add([(self.name, self._key(labels), '', amount)])
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS, enabled=METRICS_ENABLED,
+                 store=metric_store):
+        super().__init__(name, help_text, labelnames, enabled, store)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        # Bucket counts are stored per bucket (the last one is +Inf) and summed up when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        self.store.add([(self.name, key, str(index), 1), (self.name, key, 'sum', value),
+                        (self.name, key, 'count', 1)])
+
+    def _samples(self):
+        lines = []
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for key, fields in self.store.read(self.name).items():
+            counts = [fields.get(str(index), 0) for index in range(len(bounds))]
+            total, count = fields.get('sum', 0.0), fields.get('count', 0)
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += int(bucket_count)
+                labels = _format_labels(self.labelnames, key, [('le', bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+class CollectedMetric(Metric):
+    """A gauge or counter read from another component when /metrics is scraped
+
+    collect() returns either a number or a {label values tuple: number} dict.
+    """
+
+    def __init__(self, name, help_text, collect, kind='gauge', labelnames=(), enabled=METRICS_ENABLED):
+        super().__init__(name, help_text, labelnames, enabled, None)
+        self.kind = kind
+        self.collect = collect
+
+    def _samples(self):
+        try:
+            values = self.collect()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+CALLBACK_LATENCY = Histogram(
+    'dash_callback_duration_seconds', 'Time spent serving a Dash callback request', ['callback'])
+CALLBACK_RESPONSE_BYTES = Histogram(
+    'dash_callback_response_bytes', 'Size of Dash callback responses', ['callback'], SIZE_BUCKETS)
+CALLBACK_ERRORS = Counter(
+    'dash_callback_errors_total', 'Dash callback requests that failed with a server error', ['callback'])
+CALLBACK_WORK_LATENCY = Histogram(
+    'dash_callback_work_duration_seconds',
+    'Time spent computing a callback, in the request thread or a background job', ['callback'])
+
+CACHE_LOOKUPS = Counter(
+    'response_cache_lookups_total', 'Response cache lookups by result (memory, disk, miss)', ['result'])
+
+UPSTREAM_LATENCY = Histogram(
+    'meteomatics_request_duration_seconds', 'Latency of Meteomatics API queries', ['outcome'])
+UPSTREAM_REQUESTS = Counter(
+    'meteomatics_requests_total',
+    'Meteomatics queries by outcome (ok, error, rate_limited, circuit_open)', ['outcome'])
+
+TILE_BYTES = Counter(
+    'tile_proxy_bytes_total',
+    'Tile bytes served by the proxy by source (cache, upstream, revalidated, stale, rendered)',
+    ['layer', 'source'])
+
+
+def timed_callback(label):
+    """Decorator recording the run time of a callback body under label
+
+    The HTTP timing of register_metrics only sees the dispatch and polling
+    requests of a background callback, not the job itself.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                CALLBACK_WORK_LATENCY.observe(time.perf_counter() - started, callback=label)
+        return wrapper
+    return decorator
+
+
+def callback_label(output):
+    """Readable id of a callback from its Dash output string: its first output"""
+    first = output.strip('.').split('...')[0]
+    return first.split('@')[0] or 'unknown'
+
+
+def register_metrics(server):
+    """Time every Dash callback request and expose /metrics on the Flask server
+
+    Values are kept in the shared metric store, so every worker reports the
+    totals of all workers and background jobs. Nothing is registered when
+    disabled.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    from utils.tile_proxy import tile_cache
+
+    def cache_hit_ratio():
+        lookups = {key[0]: value for key, value in CACHE_LOOKUPS.values().items()}
+        total = sum(lookups.values())
+        return (lookups.get('memory', 0) + lookups.get('disk', 0)) / total if total else 0.0
+
+    CollectedMetric(
+        'response_cache_hit_ratio', 'Share of response cache lookups served from cache', cache_hit_ratio)
+    CollectedMetric(
+        'tile_cache_bytes', 'Bytes held in the on-disk tile cache', lambda: tile_cache.stats()['bytes'])
+    CollectedMetric(
+        'tile_cache_tiles', 'Tiles held in the on-disk tile cache', lambda: tile_cache.stats()['tiles'])
+
+    @server.before_request
+    def start_callback_timer():
+        if request.path.endswith('/_dash-update-component'):
+            g.callback_started = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        started = g.pop('callback_started', None)
+        if started is None:
+            return response
+
+        body = request.get_json(silent=True) or {}
+        label = callback_label(body.get('output', ''))
+        CALLBACK_LATENCY.observe(time.perf_counter() - started, callback=label)
+        if not response.direct_passthrough:
+            CALLBACK_RESPONSE_BYTES.observe(response.calculate_content_length() or 0, callback=label)
+        if response.status_code >= 500:
+            CALLBACK_ERRORS.inc(callback=label)
+        return response
+
+    @server.route('/metrics')
+    def serve_metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,106 @@
+# utils/point_queries.py
+import logging
+import os
+import threading
+
+from utils.api_client import get_meteomatics_data, get_meteomatics_data_batch, get_cached_meteomatics_data
+from utils.config import CLICK_BATCH_WINDOW_MS
+
+logger = logging.getLogger(__name__)
+
+# Returned to a request replaced by a newer click of the same session
+SUPERSEDED = object()
+
+
+class PointBatcher:
+    """Debounce and batch point queries coming from map clicks
+
+    Cached points are answered at once. Other requests wait up to `window`
+    seconds so clicks arriving together, from any session, go upstream as
+    one multi-coordinate query. A newer click from the same session
+    replaces its pending one, which gets SUPERSEDED back.
+
+    Batching happens per process. A background callback job runs in a
+    forked process that only ever sees its own click, so there the window
+    is dropped and the point is fetched at once.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = []
+        self._by_session = {}
+        self._timer = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._stop_batching)
+
+    def _stop_batching(self):
+        self.window = 0
+        self._lock = threading.Lock()
+        self._pending, self._by_session, self._timer = [], {}, None
+
+    def fetch(self, lat, lon, year, include_co=False, session_id=None):
+        """Data for a (snapped) point and year, None on failure, or SUPERSEDED"""
+        cached = get_cached_meteomatics_data(lat, lon, year, include_co)
+        if cached is not None:
+            return cached
+        if self.window <= 0:
+            # Nothing to wait for: go through the single-flight path shared across processes
+            return get_meteomatics_data(lat, lon, year, include_co)
+
+        request = {
+            'point': (lat, lon, year),
+            'include_co': include_co,
+            'session_id': session_id,
+            'done': threading.Event(),
+            'result': None
+        }
+        with self._lock:
+            previous = self._by_session.get(session_id) if session_id else None
+            if previous is not None and any(queued is previous for queued in self._pending):
+                self._pending = [queued for queued in self._pending if queued is not previous]
+                previous['result'] = SUPERSEDED
+                previous['done'].set()
+            if session_id:
+                self._by_session[session_id] = request
+            self._pending.append(request)
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        request['done'].wait()
+        return request['result']
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending, self._timer = self._pending, [], None
+            for request in pending:
+                if self._by_session.get(request['session_id']) is request:
+                    del self._by_session[request['session_id']]
+
+        groups = {}
+        for request in pending:
+            groups.setdefault(request['include_co'], []).append(request)
+
+        for include_co, requests in groups.items():
+            points = [request['point'] for request in requests]
+            try:
+                if len(set(points)) == 1:
+                    # A lone point goes through the single-flight path shared across processes
+                    results = {points[0]: get_meteomatics_data(*points[0], include_co)}
+                else:
+                    logger.info("Batching %d clicked points into one query", len(points))
+                    results = get_meteomatics_data_batch(points, include_co)
+            except Exception as e:
+                logger.error("Error fetching clicked points: %s", e)
+                results = {}
+
+            for request in requests:
+                data = results.get(request['point'])
+                request['result'] = dict(data) if data is not None else None
+                request['done'].set()
+
+
+point_batcher = PointBatcher(CLICK_BATCH_WINDOW_MS / 1000)
@@ -0,0 +1,149 @@
+# utils/prefetch.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from data.catalog import resolve_region, DEFAULT_ZOOM
+from utils.api_client import get_meteomatics_data
+from utils.config import (
+    FIRST_YEAR, LAST_YEAR, CO_SOURCE, TILE_PROXY_ENABLED,
+    PREFETCH_WORKERS, PREFETCH_YEARS, PREFETCH_MAX_TILES
+)
+from utils.helpers import composite_date, modis_date, mopitt_date, region_bounds, tiles_in_bounds
+from utils.co_sampler import sample_co
+from utils.compositing import warm_tile
+
+logger = logging.getLogger(__name__)
+
+
+def next_years(year, count):
+    """The count years that follow year in the looping animation"""
+    span = LAST_YEAR - FIRST_YEAR + 1
+    return [FIRST_YEAR + (year - FIRST_YEAR + step) % span for step in range(1, count + 1)]
+
+
+class AnimationPrefetcher:
+    """Warm weather data and map tiles for the years ahead of the playhead
+
+    Each session has at most one active plan. Work runs on a shared bounded
+    thread pool; stopping or restarting a plan bumps its generation so queued
+    tasks of the old plan are cancelled or skip themselves.
+    """
+
+    def __init__(self, max_workers=4, lookahead=3, max_tiles=48):
+        self.lookahead = lookahead
+        self.max_tiles = max_tiles
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._generation = 0
+
+    def start(self, session_id, region_name, year, instruments, with_borders, bounds=None, zoom=None):
+        """Start (or restart) prefetching for a session that pressed Play"""
+        region = resolve_region(region_name)
+        if region is None:
+            return
+
+        if not bounds or zoom is None:
+            # Fall back to the region's default view
+            zoom = region['zoom'] or DEFAULT_ZOOM
+            bounds = region_bounds(region['lat'], region['lon'], zoom)
+
+        self.stop(session_id)
+        with self._lock:
+            self._generation += 1
+            self._plans[session_id] = {
+                'generation': self._generation,
+                'region': region,
+                'instruments': list(instruments or ['modis']),
+                'tiles': tiles_in_bounds(bounds, int(zoom), self.max_tiles),
+                'scheduled': set(),
+                'futures': []
+            }
+
+        if with_borders:
+            self._submit(session_id, lambda: self._warm_tiles('borders', 'default', session_id))
+        self.advance(session_id, year)
+
+    def stop(self, session_id):
+        """Cancel everything still queued for a session"""
+        with self._lock:
+            plan = self._plans.pop(session_id, None)
+        if plan is not None:
+            for future in plan['futures']:
+                future.cancel()
+
+    def advance(self, session_id, year, count=None):
+        """Schedule the count (default lookahead) years ahead of the playhead not warmed yet"""
+        with self._lock:
+            plan = self._plans.get(session_id)
+            if plan is None:
+                return
+            plan['futures'] = [future for future in plan['futures'] if not future.done()]
+            years = [y for y in next_years(year, count or self.lookahead) if y not in plan['scheduled']]
+            plan['scheduled'].update(years)
+
+        for next_year in years:
+            self._submit(session_id, lambda y=next_year: self._warm_year(session_id, y))
+
+    def _submit(self, session_id, task):
+        with self._lock:
+            plan = self._plans.get(session_id)
+            if plan is None:
+                return
+            generation = plan['generation']
+            future = self._executor.submit(self._run, session_id, generation, task)
+            plan['futures'].append(future)
+
+    def _active(self, session_id, generation):
+        with self._lock:
+            plan = self._plans.get(session_id)
+            return plan is not None and plan['generation'] == generation
+
+    def _run(self, session_id, generation, task):
+        if not self._active(session_id, generation):
+            return
+        try:
+            task()
+        except Exception as e:
+            logger.warning("Prefetch task failed: %s", e)
+
+    def _warm_year(self, session_id, year):
+        with self._lock:
+            plan = self._plans.get(session_id)
+        if plan is None:
+            return
+
+        region = plan['region']
+        include_co = 'mopitt' in plan['instruments']
+        # Warm the same entries the callbacks read: with the MOPITT source CO
+        # is sampled from the tiles rather than requested upstream
+        use_mopitt = include_co and CO_SOURCE == 'mopitt'
+        get_meteomatics_data(region['lat'], region['lon'], year, include_co and not use_mopitt)
+        if use_mopitt:
+            sample_co(region['lat'], region['lon'], year)
+
+        if 'modis' in plan['instruments'] and include_co:
+            self._warm_tiles('composite', composite_date(year), session_id)
+        elif include_co:
+            self._warm_tiles('mopitt', mopitt_date(year), session_id)
+        else:
+            self._warm_tiles('modis', modis_date(year), session_id)
+
+    def _warm_tiles(self, layer, date, session_id):
+        if not TILE_PROXY_ENABLED:
+            return
+        with self._lock:
+            plan = self._plans.get(session_id)
+        if plan is None:
+            return
+
+        generation = plan['generation']
+        for z, y, x in plan['tiles']:
+            # Stop mid-way when the user pauses or switches region
+            if not self._active(session_id, generation):
+                return
+            warm_tile(layer, date, z, y, x)
+
+
+prefetcher = AnimationPrefetcher(PREFETCH_WORKERS, PREFETCH_YEARS, PREFETCH_MAX_TILES)
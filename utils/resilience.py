@@ -0,0 +1,218 @@
+# utils/resilience.py
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: state is only shared between threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Upstream failures worth retrying: timeouts, dropped connections, 408, 429
+# and 500. Matched by class name so both requests and meteomatics exceptions
+# qualify without importing either here.
+TRANSIENT_ERROR_NAMES = {
+    'ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout',
+    'TooManyRequests', 'RequestTimeout', 'InternalServerError'
+}
+
+# meteomatics raises a bare WeatherApiException for every status it has no
+# class for, 502, 503 and 504 included. Only its client error subclasses
+# mean upstream answered and rejected the request.
+API_ERROR_NAME = 'WeatherApiException'
+CLIENT_ERROR_NAMES = {
+    'BadRequest', 'Unauthorized', 'PaymentRequired', 'Forbidden', 'NotFound',
+    'PayloadTooLarge', 'UriTooLong'
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no request token became available in time"""
+
+
+def _error_names(error):
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+def is_client_error(error):
+    """Whether upstream rejected the request itself (4xx), so retrying cannot help"""
+    return bool(_error_names(error) & CLIENT_ERROR_NAMES)
+
+
+def is_transient_error(error):
+    """Whether an upstream error is worth retrying"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    names = _error_names(error)
+    if names & TRANSIENT_ERROR_NAMES:
+        return True
+    return API_ERROR_NAME in names and not names & CLIENT_ERROR_NAMES
+
+
+class LocalState:
+    """State of a resilience primitive kept in this process"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def update(self):
+        with self._lock:
+            yield self._data
+
+
+class FileState:
+    """State of a resilience primitive shared by every process through a locked JSON file
+
+    Each update holds an exclusive flock on the file, so gunicorn workers,
+    background jobs and offline tools using the same CACHE_DIR see a single
+    rate limit and circuit breaker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def update(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock, open(self.path, 'a+') as state_file:
+            if fcntl is not None:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                raw = state_file.read()
+                try:
+                    data = json.loads(raw) if raw else {}
+                except ValueError:
+                    data = {}
+                original = dict(data)
+                yield data
+                if data != original:
+                    state_file.seek(0)
+                    state_file.truncate()
+                    json.dump(data, state_file)
+                    state_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+
+
+class TokenBucket:
+    """Token bucket: rate tokens per second, bursts up to capacity
+
+    The bucket lives in store: a LocalState by default, or a FileState to
+    share one limit between processes.
+    """
+
+    def __init__(self, rate, capacity, store=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store or LocalState()
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to timeout seconds; False if none came"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.store.update() as state:
+                now = time.time()
+                tokens = state.get('tokens', self.capacity)
+                updated = state.get('updated', now)
+                tokens = min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+                if tokens >= 1:
+                    state.update(tokens=tokens - 1, updated=now)
+                    return True
+                state.update(tokens=tokens, updated=now)
+                wait = (1 - tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream for a while
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    A trial that never reports back (its process died) is given up after
+    another reset_timeout. State lives in store like TokenBucket's.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60, store=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.store = store or LocalState()
+
+    @property
+    def state(self):
+        with self.store.update() as state:
+            opened_at = state.get('opened_at')
+            if opened_at is None:
+                return 'closed'
+            if time.time() - opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        with self.store.update() as state:
+            opened_at = state.get('opened_at')
+            if opened_at is None:
+                return True
+            now = time.time()
+            trial_started = state.get('trial_started')
+            if now - opened_at < self.reset_timeout:
+                return False
+            if trial_started is not None and now - trial_started < self.reset_timeout:
+                return False
+            state['trial_started'] = now
+            return True
+
+    def record_success(self):
+        with self.store.update() as state:
+            state.update(failures=0, opened_at=None, trial_started=None)
+
+    def record_failure(self):
+        with self.store.update() as state:
+            state['failures'] = state.get('failures', 0) + 1
+            if state.get('trial_started') is not None or state['failures'] >= self.failure_threshold:
+                state['opened_at'] = time.time()
+            state['trial_started'] = None
+
+
+def retry_with_backoff(fn, retries=3, base_delay=0.5, max_delay=8.0, should_retry=is_transient_error,
+                       deadline=None, attempt_seconds=0.0):
+    """Call fn(), retrying transient errors with full-jitter exponential backoff
+
+    With a deadline (seconds from the first call), a retry is only started
+    when it can take attempt_seconds and still end before the deadline.
+    """
+    started = time.monotonic()
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not should_retry(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if deadline is not None and time.monotonic() - started + delay + attempt_seconds > deadline:
+                logger.warning("Transient upstream error (%s), no time left to retry", e)
+                raise
+            logger.warning("Transient upstream error (%s), retrying in %.1fs", e, delay)
+            time.sleep(delay)
@@ -0,0 +1,74 @@
+# utils/singleflight.py
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coalescing only
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution
+
+    Threads of one process wait on the in-flight call of the first caller.
+    When lock_dir is set, the first caller of every process also takes an
+    exclusive file lock for the key, so workers of a multi-process server
+    run the call one at a time and can pick up each other's cached result.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @contextmanager
+    def _process_lock(self, key):
+        if fcntl is None or self.lock_dir is None:
+            yield
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock'
+        with open(os.path.join(self.lock_dir, name), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers of key and share its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._process_lock(key):
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,264 @@
+# utils/tile_proxy.py
+import logging
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from flask import Response, abort, request
+
+from utils.config import CACHE_DIR, TILE_CACHE_MAX_MB, TILE_REVALIDATE_HOURS
+from utils.helpers import UPSTREAM_TILE_URLS, TILE_PROXY_PREFIX
+from utils.metrics import TILE_BYTES
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TILE_MAX_ZOOM = {
+    'modis': 9,
+    'mopitt': 6,
+    'borders': 19
+}
+
+DATE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}|default)$')
+
+UPSTREAM_TIMEOUT = 15
+USER_AGENT = 'nassa-terra-instruments-tile-proxy/1.0'
+
+
+class TileCache:
+    """Size-bounded on-disk LRU cache of tiles
+
+    Tile bodies are files sharded under the cache directory; a SQLite index
+    keeps their validators (ETag / Last-Modified), size and last access so
+    the least recently used tiles are evicted once max_bytes is exceeded.
+    Triggers keep the tile count and total size in a one-row tile_stats
+    table within the same transaction, so puts never sum the whole index.
+    """
+
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS tiles ('
+                'key TEXT PRIMARY KEY, size INTEGER NOT NULL, content_type TEXT, '
+                'etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles (accessed_at)')
+            self._create_stats(conn)
+            self._local.conn = conn
+        return conn
+
+    def _create_stats(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS tile_stats ('
+            'id INTEGER PRIMARY KEY CHECK (id = 0), tiles INTEGER NOT NULL, bytes INTEGER NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tiles_inserted AFTER INSERT ON tiles BEGIN '
+            'UPDATE tile_stats SET tiles = tiles + 1, bytes = bytes + NEW.size; END'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tiles_deleted AFTER DELETE ON tiles BEGIN '
+            'UPDATE tile_stats SET tiles = tiles - 1, bytes = bytes - OLD.size; END'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tiles_resized AFTER UPDATE OF size ON tiles BEGIN '
+            'UPDATE tile_stats SET bytes = bytes - OLD.size + NEW.size; END'
+        )
+        # Indexes from before the stats table are counted once
+        if conn.execute('SELECT 1 FROM tile_stats').fetchone() is None:
+            conn.execute('INSERT INTO tile_stats SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM tiles')
+        conn.commit()
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        """Return (body, meta) for a cached tile, or (None, None)"""
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT content_type, etag, last_modified, fetched_at, accessed_at FROM tiles WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None, None
+
+        try:
+            with open(self._path(key), 'rb') as tile_file:
+                body = tile_file.read()
+        except OSError:
+            conn.execute('DELETE FROM tiles WHERE key = ?', (key,))
+            conn.commit()
+            return None, None
+
+        now = time.time()
+        if now - row[4] > self.ACCESS_RESOLUTION:
+            conn.execute('UPDATE tiles SET accessed_at = ? WHERE key = ?', (now, key))
+            conn.commit()
+
+        meta = {'content_type': row[0], 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+        return body, meta
+
+    def put(self, key, body, content_type, etag=None, last_modified=None):
+        """Store a tile and evict least recently used tiles over the size limit"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tile_file:
+            tile_file.write(body)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        conn = self._connection()
+        # An upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the delete trigger
+        conn.execute(
+            'INSERT INTO tiles (key, size, content_type, etag, last_modified, fetched_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'size = excluded.size, content_type = excluded.content_type, etag = excluded.etag, '
+            'last_modified = excluded.last_modified, fetched_at = excluded.fetched_at, '
+            'accessed_at = excluded.accessed_at',
+            (key, len(body), content_type, etag, last_modified, now, now)
+        )
+        conn.commit()
+        self._evict(conn)
+
+    def touch(self, key):
+        """Mark a cached tile as freshly validated"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('UPDATE tiles SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+        conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT bytes FROM tile_stats').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% so we do not evict again on the very next put
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in conn.execute('SELECT key, size FROM tiles ORDER BY accessed_at'):
+            victims.append(key)
+            freed += size
+            if freed >= target:
+                break
+
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        conn.executemany('DELETE FROM tiles WHERE key = ?', [(key,) for key in victims])
+        conn.commit()
+
+    def stats(self):
+        """Number of cached tiles and their total size in bytes"""
+        count, total = self._connection().execute('SELECT tiles, bytes FROM tile_stats').fetchone()
+        return {'tiles': count, 'bytes': total}
+
+
+tile_cache = TileCache(os.path.join(CACHE_DIR, 'tiles'), TILE_CACHE_MAX_MB * 1024 * 1024)
+
+tile_flight = SingleFlight(os.path.join(CACHE_DIR, 'locks'))
+
+
+def _upstream_request(url, meta=None):
+    headers = {'User-Agent': USER_AGENT}
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    return urllib.request.Request(url, headers=headers)
+
+
+def _refresh_tile(key, url, body, meta):
+    """Fetch a missing or stale tile from upstream, revalidating when possible"""
+    layer = key.split('/', 1)[0]
+    try:
+        with urllib.request.urlopen(_upstream_request(url, meta), timeout=UPSTREAM_TIMEOUT) as response:
+            new_body = response.read()
+            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            tile_cache.put(key, new_body, content_type,
+                           response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            TILE_BYTES.inc(len(new_body), layer=layer, source='upstream')
+            return new_body, content_type
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and body is not None:
+            tile_cache.touch(key)
+            TILE_BYTES.inc(len(body), layer=layer, source='revalidated')
+            return body, meta['content_type']
+        logger.warning("Tile upstream returned %s for %s", e.code, url)
+    except (urllib.error.URLError, OSError) as e:
+        logger.warning("Tile upstream unavailable for %s: %s", url, e)
+
+    # Serve the stale copy rather than nothing when upstream fails
+    if body is not None:
+        TILE_BYTES.inc(len(body), layer=layer, source='stale')
+        return body, meta['content_type']
+    return None, None
+
+
+def fetch_tile(layer, date, z, y, x):
+    """Return (body, content_type) of a tile, from cache or upstream"""
+    if layer not in UPSTREAM_TILE_URLS or not DATE_PATTERN.match(date):
+        return None, None
+    if not 0 <= z <= TILE_MAX_ZOOM[layer] or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return None, None
+
+    key = f"{layer}/{date}/{z}/{y}/{x}"
+    body, meta = tile_cache.get(key)
+    if body is not None and time.time() - meta['fetched_at'] < TILE_REVALIDATE_HOURS * 3600:
+        TILE_BYTES.inc(len(body), layer=layer, source='cache')
+        return body, meta['content_type']
+
+    url = UPSTREAM_TILE_URLS[layer].replace('{date}', date).format(z=z, y=y, x=x)
+
+    def refresh():
+        # Another worker may have refreshed the tile while we waited
+        fresh_body, fresh_meta = tile_cache.get(key)
+        if fresh_body is not None and time.time() - fresh_meta['fetched_at'] < TILE_REVALIDATE_HOURS * 3600:
+            return fresh_body, fresh_meta['content_type']
+        return _refresh_tile(key, url, fresh_body, fresh_meta)
+
+    return tile_flight.do(key, refresh)
+
+
+def tile_response(body, content_type):
+    """Build a cacheable tile response honouring the browser's If-None-Match"""
+    if body is None:
+        abort(404)
+
+    etag = hashlib.sha1(body).hexdigest()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    response = Response(body, mimetype=content_type)
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+def register_tile_proxy(server):
+    """Add the tile proxy route to the Flask server behind Dash"""
+
+    @server.route(f"{TILE_PROXY_PREFIX}/<layer>/<date>/<int:z>/<int:y>/<int:x>")
+    def serve_tile(layer, date, z, y, x):
+        return tile_response(*fetch_tile(layer, date, z, y, x))
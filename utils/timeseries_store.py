@@ -0,0 +1,48 @@
+# utils/timeseries_store.py
+import hashlib
+import os
+import time
+
+import numpy as np
+
+
+class TimeSeriesStore:
+    """On-disk columnar store for hourly time series
+
+    Each series is one compressed .npz file holding an int64 'time' column
+    (epoch seconds) and a float32 (parameters x hours) 'values' matrix.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+    def get(self, key, max_age=None):
+        """Return {'time': ..., parameter: ...} arrays, or None when missing or too old"""
+        path = self._path(key)
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with np.load(path, allow_pickle=False) as stored:
+                columns = {'time': stored['time']}
+                for name, values in zip(stored['columns'], stored['values']):
+                    columns[str(name)] = values
+                return columns
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def set(self, key, columns):
+        """Store a {'time': ..., parameter: ...} mapping of equal-length arrays"""
+        os.makedirs(self.directory, exist_ok=True)
+        names = [name for name in columns if name != 'time']
+        values = np.vstack([np.asarray(columns[name], dtype=np.float32) for name in names]) \
+            if names else np.empty((0, len(columns['time'])), dtype=np.float32)
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as tmp_file:
+            np.savez_compressed(tmp_file, time=np.asarray(columns['time'], dtype=np.int64),
+                                columns=np.array(names), values=values)
+        os.replace(tmp_path, path)
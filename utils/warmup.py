@@ -0,0 +1,91 @@
+# utils/warmup.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data.regions import REGIONS_DATA
+from utils.api_client import get_meteomatics_data_batch
+from utils.config import (
+    FIRST_YEAR, LAST_YEAR, CO_SOURCE, TILE_PROXY_ENABLED,
+    PREFETCH_MAX_TILES, WARMUP_TILES, WARMUP_WORKERS
+)
+from utils.co_sampler import sample_co_values
+from utils.compositing import warm_tile
+from utils.logging_setup import configure_logging
+from utils.helpers import composite_date, modis_date, mopitt_date, region_bounds, tiles_in_bounds
+
+logger = logging.getLogger(__name__)
+
+
+def warm_weather(years):
+    """Fill the response cache for every region and year in batched requests"""
+    points = [(region['lat'], region['lon'], year) for region in REGIONS_DATA.values() for year in years]
+
+    # The CO parameter is only requested upstream with the meteomatics source
+    variants = [False, True] if CO_SOURCE == 'meteomatics' else [False]
+    for include_co in variants:
+        results = get_meteomatics_data_batch(points, include_co)
+        missing = sum(1 for data in results.values() if data is None)
+        logger.info("Warm-up: %d/%d weather points cached (include_co=%s)",
+                    len(results) - missing, len(results), include_co)
+
+    if CO_SOURCE == 'mopitt':
+        coordinates = [(region['lat'], region['lon']) for region in REGIONS_DATA.values()]
+        for year in years:
+            sample_co_values(coordinates, year)
+
+
+def tile_tasks(years):
+    """(layer, date, z, y, x) of the tiles in every region's default view"""
+    tasks = []
+    for region in REGIONS_DATA.values():
+        zoom = region['zoom']
+        tiles = tiles_in_bounds(region_bounds(region['lat'], region['lon'], zoom), zoom, PREFETCH_MAX_TILES)
+        tasks.extend(('borders', 'default') + tile for tile in tiles)
+        for year in years:
+            for tile in tiles:
+                tasks.append(('modis', modis_date(year)) + tile)
+                tasks.append(('mopitt', mopitt_date(year)) + tile)
+                tasks.append(('composite', composite_date(year)) + tile)
+    return list(dict.fromkeys(tasks))
+
+
+def _warm_tile(task):
+    layer, date, z, y, x = task
+    try:
+        warm_tile(layer, date, z, y, x)
+    except Exception as e:
+        logger.warning("Warm-up tile %s/%s/%s/%s/%s failed: %s", layer, date, z, y, x, e)
+
+
+def warm_tiles(years, workers=WARMUP_WORKERS):
+    """Fill the tile cache with the default view of every region and year"""
+    tasks = tile_tasks(years)
+    with ThreadPoolExecutor(workers, thread_name_prefix='warmup') as executor:
+        list(executor.map(_warm_tile, tasks))
+    logger.info("Warm-up: %d tiles cached", len(tasks))
+
+
+def warm_caches(years=None, tiles=WARMUP_TILES):
+    """Populate the data and tile caches shared by all workers
+
+    Failures are reported and skipped: a cold cache only makes the first
+    requests slower, so it must never keep the server from starting.
+    """
+    years = list(years or range(FIRST_YEAR, LAST_YEAR + 1))
+    started = time.monotonic()
+
+    try:
+        warm_weather(years)
+    except Exception as e:
+        logger.error("Warm-up of weather data failed: %s", e)
+
+    if tiles and TILE_PROXY_ENABLED:
+        warm_tiles(years)
+
+    logger.info("Warm-up finished in %.1fs", time.monotonic() - started)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    warm_caches()
@@ -0,0 +1,5 @@
+# wsgi.py
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:server
+from app import app
+
+server = app.server